@@ -24,7 +24,9 @@ class Game(tk.Frame):
 
     
     def make_GUI(self):
-        # grid
+        # grid; drawn holds the values currently shown, so redraws only touch changed cells
+        self.drawn = [[0]*4 for _ in range(4)]
+        self.drawn_score = 0
         self.cells = []
         for i in range(4):
             row = []
@@ -59,20 +61,12 @@ class Game(tk.Frame):
         row = random.randint(0, 3)
         col = random.randint(0, 3)
         self.matrix[row][col] = 2
-        self.cells[row][col]["frame"].configure(bg=c.CELL_COLORS[2])
-        self.cells[row][col]["number"].configure(bg=c.CELL_COLORS[2], 
-                                                   fg=c.CELL_NUMBER_COLORS[2],
-                                                   font=c.CELL_NUMBER_FONTS[2],
-                                                   text="2")
+        self.update_single_cell(row, col)
         while(self.matrix[row][col] != 0):
             row = random.randint(0, 3)
             col = random.randint(0, 3)
         self.matrix[row][col] = 2
-        self.cells[row][col]["frame"].configure(bg=c.CELL_COLORS[2])
-        self.cells[row][col]["number"].configure(bg=c.CELL_COLORS[2], 
-                                                   fg=c.CELL_NUMBER_COLORS[2],
-                                                   font=c.CELL_NUMBER_FONTS[2],
-                                                   text="2")
+        self.update_single_cell(row, col)
         self.score = 0
 
     def stack(self):
@@ -117,21 +111,28 @@ class Game(tk.Frame):
                 col = random.randint(0, 3)
             self.matrix[row][col] = random.choice([2,4])
 
+    def update_single_cell(self, row, col):
+        cell_value = self.matrix[row][col]
+        if cell_value == 0:
+            self.cells[row][col]["frame"].configure(bg=c.EMPTY_CELL_COLOR)
+            self.cells[row][col]["number"].configure(bg=c.EMPTY_CELL_COLOR, text="")
+        else:
+            self.cells[row][col]["frame"].configure(bg=c.CELL_COLORS[cell_value])
+            self.cells[row][col]["number"].configure(bg=c.CELL_COLORS[cell_value],
+                                                   fg=c.CELL_NUMBER_COLORS[cell_value],
+                                                   font=c.CELL_NUMBER_FONTS[cell_value],
+                                                   text=str(cell_value))
+        self.drawn[row][col] = cell_value
+
     def update_GUI(self):
+        # only the cells whose value differs from what is on screen
         for i in range(4):
             for j in range(4):
-                cell_value = self.matrix[i][j]
-                if cell_value == 0:
-                    self.cells[i][j]["frame"].configure(bg=c.EMPTY_CELL_COLOR)
-                    self.cells[i][j]["number"].configure(bg=c.EMPTY_CELL_COLOR, text="")
-                else:
-                    self.cells[i][j]["frame"].configure(bg=c.CELL_COLORS[cell_value])
-                    self.cells[i][j]["number"].configure(bg=c.CELL_COLORS[cell_value],
-                                                           fg=c.CELL_NUMBER_COLORS[cell_value],
-                                                           font=c.CELL_NUMBER_FONTS[cell_value],
-                                                           text=str(cell_value))
-        self.score_label.configure(text=self.score)
-        self.update_idletasks()
+                if self.matrix[i][j] != self.drawn[i][j]:
+                    self.update_single_cell(i, j)
+        if self.score != self.drawn_score:
+            self.score_label.configure(text=self.score)
+            self.drawn_score = self.score
 
     def left(self, event):
         self.stack()
@@ -1,11 +1,80 @@
 import tkinter as tk
 import colors as c
 import random
+import time
+import queue
+import threading
 import numpy as np
 from Expectimax2048 import ai_move  
 
 SEARCHES_PER_MOVE = 40
 SEARCH_LENGTH = 20
+# spread root-move subtrees over all cores (see parallel_search.py)
+PARALLEL_SEARCH = True
+# how often the window collects moves finished by the search thread
+RESULT_POLL_MS = 10
+# the search thread waits when it is this many moves ahead of the window
+MAX_MOVES_AHEAD = 8
+# frame skip: redraw the board at most this many times per second while
+# the bot plays faster; None draws after every poll that brought a move
+MAX_REDRAWS_PER_SECOND = None
+
+
+def add_random_tile(matrix):
+    """
+    Dokłada 2 albo 4 w losowym wolnym polu macierzy (listy list).
+    """
+    if any(0 in row for row in matrix):
+        row = random.randint(0, 3)
+        col = random.randint(0, 3)
+        while(matrix[row][col] != 0):
+            row = random.randint(0, 3)
+            col = random.randint(0, 3)
+        matrix[row][col] = random.choice([2,4])
+
+
+class AIWorker(threading.Thread):
+    """
+    Wątek szukający ruchów bota poza pętlą Tk. Po każdym ruchu sam dokłada
+    nowy kafelek i od razu szuka kolejnego ruchu, więc wyszukiwanie nie
+    czeka na rysowanie. Wyniki trafiają do kolejki results jako
+    ("move", macierz z nowym kafelkiem, punkty), a na końcu ("done",)
+    albo ("error", opis) po dowolnym wyjątku wyszukiwania.
+    """
+
+    def __init__(self, matrix, max_ahead=MAX_MOVES_AHEAD):
+        threading.Thread.__init__(self, daemon=True)
+        self.board = np.array(matrix, dtype='int')
+        self.results = queue.Queue(maxsize=max_ahead)
+        self.stopped = threading.Event()
+
+    def run(self):
+        board = self.board
+        while not self.stopped.is_set() and 2048 not in board:
+            try:
+                new_board, valid_move, move_score = ai_move(board, SEARCHES_PER_MOVE, SEARCH_LENGTH, parallel=PARALLEL_SEARCH)
+            except Exception as error:
+                self.post(("error", f"{type(error).__name__}: {error}"))
+                return
+            if not valid_move:
+                break
+            matrix = new_board.tolist()
+            add_random_tile(matrix)
+            board = np.array(matrix, dtype='int')
+            self.post(("move", matrix, int(move_score)))
+        self.post(("done",))
+
+    def post(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def stop(self):
+        self.stopped.set()
+
 
 class Game(tk.Frame):
     def __init__(self):
@@ -24,11 +93,16 @@ class Game(tk.Frame):
         self.master.bind("<Right>", self.right)
         self.master.bind("<Up>", self.up)
         self.master.bind("<Down>", self.down)
+        # closing the window stops the search thread
+        self.bind("<Destroy>", lambda event: self.stop_bot())
 
         self.mainloop()
 
     def make_GUI(self):
-        # grid
+        # grid; drawn holds the values currently shown, so redraws only touch changed cells
+        self.drawn = [[0]*4 for _ in range(4)]
+        self.drawn_score = 0
+        self.last_redraw = 0.0
         self.cells = []
         for i in range(4):
             row = []
@@ -60,6 +134,7 @@ class Game(tk.Frame):
         self.bot_button = tk.Button(self, text="Start Game", command=self.run_bot_loop, font=("Verdana", 14, "bold"), bg="#8f7a66", fg="white")
         self.bot_button.place(relx=0.5, y=720, anchor='center')
         self.ai_running = False
+        self.worker = None
 
     def start_game(self):
         self.matrix = [[0]*4 for _ in range(4)]
@@ -77,47 +152,66 @@ class Game(tk.Frame):
         self.update_single_cell(row, col)
 
     def update_single_cell(self, row, col):
-        val = self.matrix[row][col]
+        val = int(self.matrix[row][col])
         if val == 0:
              self.cells[row][col]["frame"].configure(bg=c.EMPTY_CELL_COLOR)
              self.cells[row][col]["number"].configure(bg=c.EMPTY_CELL_COLOR, text="")
         else:
-            self.cells[row][col]["frame"].configure(bg=c.CELL_COLORS[val])
-            self.cells[row][col]["number"].configure(bg=c.CELL_COLORS[val], 
-                                                   fg=c.CELL_NUMBER_COLORS[val],
-                                                   font=c.CELL_NUMBER_FONTS[val],
+            if val > 2048: bg_color = c.CELL_COLORS[2048]
+            else: bg_color = c.CELL_COLORS.get(val, "#3c3a32")
+
+            self.cells[row][col]["frame"].configure(bg=bg_color)
+            self.cells[row][col]["number"].configure(bg=bg_color,
+                                                   fg=c.CELL_NUMBER_COLORS.get(val, "#f9f6f2"),
+                                                   font=c.CELL_NUMBER_FONTS.get(val, ("Verdana", 30, "bold")),
                                                    text=str(val))
+        self.drawn[row][col] = val
 
     def run_bot_loop(self):
         if not self.ai_running:
             self.ai_running = True
             self.bot_button.place_forget()
-            self.perform_ai_move()
+            self.worker = AIWorker(self.matrix)
+            self.worker.start()
+            self.after(RESULT_POLL_MS, self.poll_ai_results)
 
-    def perform_ai_move(self):
-        if any(2048 in row for row in self.matrix):
-            self.game_over()
-            return
+    def stop_bot(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+        self.ai_running = False
 
-        current_board_np = np.array(self.matrix, dtype='int')
+    def poll_ai_results(self):
+        """
+        Zbiera wszystkie ruchy gotowe od ostatniego odczytu i rysuje
+        planszę raz, po ostatnim z nich.
+        """
+        finished = False
+        while not finished:
+            try:
+                item = self.worker.results.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == "move":
+                _, self.matrix, move_score = item
+                self.score += move_score
+            elif item[0] == "error":
+                print(f"BŁĄD wyszukiwania ruchu: {item[1]}")
+                # show the moves made so far and let the bot be started again
+                self.stop_bot()
+                self.update_GUI()
+                self.bot_button.place(relx=0.5, y=720, anchor='center')
+                return
+            else:
+                finished = True
 
-        try:
-            new_board_np, valid_move, move_score = ai_move(current_board_np, SEARCHES_PER_MOVE, SEARCH_LENGTH)
-        except ValueError:
-            print("BŁĄD: Prawdopodobnie nie zaktualizowałeś pliku MCTS2048.py zgodnie z instrukcją!")
-            return
-
-        if valid_move:
-            self.matrix = new_board_np.tolist()
-            
-            self.score += int(move_score)
-            
-            self.add_new_tile()
+        if finished or self.redraw_due():
             self.update_GUI()
-            
-            self.after(50, self.perform_ai_move) 
-        else:
+        if finished:
+            self.stop_bot()
             self.game_over()
+        else:
+            self.after(RESULT_POLL_MS, self.poll_ai_results)
 
     def stack(self):
         new_matrix = [[0]*4 for _ in range(4)]
@@ -153,34 +247,30 @@ class Game(tk.Frame):
         self.matrix = new_matrix
 
     def add_new_tile(self):
-        if any(0 in row for row in self.matrix):
-            row = random.randint(0, 3)
-            col = random.randint(0, 3)
-            while(self.matrix[row][col] != 0):
-                row = random.randint(0, 3)
-                col = random.randint(0, 3)
-            self.matrix[row][col] = random.choice([2,4])
+        add_random_tile(self.matrix)
+
+    def redraw_due(self):
+        if MAX_REDRAWS_PER_SECOND is None:
+            return True
+        return time.perf_counter() - self.last_redraw >= 1 / MAX_REDRAWS_PER_SECOND
 
     def update_GUI(self):
+        """
+        Przerysowuje tylko pola, których wartość różni się od narysowanej;
+        Tk odświeża okno sam, gdy pętla jest bezczynna.
+        """
         for i in range(4):
             for j in range(4):
-                cell_value = int(self.matrix[i][j])
-                if cell_value == 0:
-                    self.cells[i][j]["frame"].configure(bg=c.EMPTY_CELL_COLOR)
-                    self.cells[i][j]["number"].configure(bg=c.EMPTY_CELL_COLOR, text="")
-                else:
-                    if cell_value > 2048: bg_color = c.CELL_COLORS[2048]
-                    else: bg_color = c.CELL_COLORS.get(cell_value, "#3c3a32")
-                    
-                    self.cells[i][j]["frame"].configure(bg=bg_color)
-                    self.cells[i][j]["number"].configure(bg=bg_color,
-                                                           fg=c.CELL_NUMBER_COLORS.get(cell_value, "#f9f6f2"),
-                                                           font=c.CELL_NUMBER_FONTS.get(cell_value, ("Verdana", 30, "bold")),
-                                                           text=str(cell_value))
-        self.score_label.configure(text=self.score)
-        self.update_idletasks()
+                if self.matrix[i][j] != self.drawn[i][j]:
+                    self.update_single_cell(i, j)
+        if self.score != self.drawn_score:
+            self.score_label.configure(text=self.score)
+            self.drawn_score = self.score
+        self.last_redraw = time.perf_counter()
 
     def left(self, event):
+        if self.ai_running:
+            return
         self.stack()
         self.combine()
         self.stack()
@@ -189,6 +279,8 @@ class Game(tk.Frame):
         self.game_over()
 
     def right(self, event):
+        if self.ai_running:
+            return
         self.reverse()
         self.stack()
         self.combine()
@@ -199,6 +291,8 @@ class Game(tk.Frame):
         self.game_over()
 
     def up(self, event):
+        if self.ai_running:
+            return
         self.transpose()
         self.stack()
         self.combine()
@@ -209,6 +303,8 @@ class Game(tk.Frame):
         self.game_over()
 
     def down(self, event):
+        if self.ai_running:
+            return
         self.transpose()
         self.reverse()
         self.stack()
@@ -249,6 +345,7 @@ class Game(tk.Frame):
             is_over = True
 
         if is_over:
+            self.stop_bot()
             if hasattr(self, 'bot_button'):
                 self.bot_button.place_forget()
 
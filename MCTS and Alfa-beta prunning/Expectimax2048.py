@@ -1,8 +1,75 @@
+import time
+import hashlib
 import numpy as np
-from game_functions import move_down, move_left, move_right, move_up
+from game_functions import generate_moves, generate_moves_into, canonical_key, ScratchArena, POSSIBLE_MOVES_COUNT
+from transposition_table import TranspositionTable
+from parallel_search import map_chunked
+from score_tables import build_score_tables, table_score_array
+from position_store import PositionStore
+from search_stats import instrumented
 
 MAX_DEPTH = 3          
 SURVIVAL_THRESHOLD = 2  
+# calculate_score terms next to WEIGHT_MATRIX; after changing any of them
+# call rebuild_score_tables()
+MONOTONICITY_WEIGHT = 10
+EMPTY_CELL_BONUS = 500000
+
+# memo of already searched positions, shared by the whole ai_move call
+USE_TRANSPOSITION_TABLE = True
+TRANSPOSITION_TABLE_SIZE = 200000
+TRANSPOSITION_TABLE_POLICY = "lru"
+KEEP_TABLE_BETWEEN_MOVES = False
+# evaluate root move x spawn cell subtrees on the parallel_search process pool
+PARALLEL_SEARCH = False
+# keys the table on the symmetry-canonical board, so all 8 mirror images share
+# one entry; only valid with a symmetric evaluator - calculate_score is not,
+# because WEIGHT_MATRIX favours one corner
+CANONICAL_TABLE_KEYS = False
+# per-move time budget in milliseconds; when set, ai_move deepens iteratively
+# until the budget is spent instead of searching to MAX_DEPTH
+TIME_BUDGET_MS = None
+MAX_ITERATIVE_DEPTH = 8
+# chance nodes expand every empty cell; branches reached with a lower
+# probability than this are scored by the heuristic instead of searched
+PROBABILITY_CUTOFF = 1e-4
+# at most this many 4-tile spawns are expanded along one path
+MAX_FOUR_SPAWNS = 2
+# Star1 cuts: a chance node stops as soon as it can no longer beat the best
+# sibling move and returns only an upper bound, which never changes the chosen
+# move; needs VALUE_UPPER_BOUND for the evaluator in use
+STAR1_PRUNING = False
+# cuts are only taken this far (relative) below alpha, so float rounding in
+# the bounds can never change the chosen move
+PRUNING_TOLERANCE = 1e-9
+# gather every frontier board of the move into one stack and score it with
+# a single calculate_score_batch call instead of one call per leaf
+BATCHED_LEAVES = False
+# on-disk store of searched root positions shared across games and processes;
+# open it with open_position_store(), writable only in one process at a time
+POSITION_STORE_PATH = None
+POSITION_STORE_WRITABLE = False
+# record search_stats counters for every ai_move into last_search_stats;
+# when off the only cost is one None check per node
+INSTRUMENT_SEARCH = False
+
+transposition_table = TranspositionTable(TRANSPOSITION_TABLE_SIZE, TRANSPOSITION_TABLE_POLICY)
+
+position_store = None
+
+# successor buffers for every search depth, reused by all nodes
+_scratch = ScratchArena(MAX_ITERATIVE_DEPTH)
+
+# deadline (time.perf_counter) of the running iterative-deepening search
+_search_deadline = None
+# depth of the last completed search, for inspection after ai_move
+last_search_depth = 0
+# SearchStats of the running ai_move, and the summary of the last one
+_stats = None
+last_search_stats = None
+
+class _SearchTimeout(Exception):
+    pass
 
 # wages matrix
 WEIGHT_MATRIX = np.array([
@@ -30,30 +97,139 @@ def calculate_score(board):
     monotonicity_score -= np.sum(np.abs(left_diff))
     monotonicity_score -= np.sum(np.abs(up_diff))
     
-    score += monotonicity_score * 10
+    score += monotonicity_score * MONOTONICITY_WEIGHT
 
     if empty_count == 0:
         return -1e9 
     else:
-        score += empty_count * 500000  
+        score += empty_count * EMPTY_CELL_BONUS
 
     return score
 
-def expectimax(board, depth, is_player_turn):
+def calculate_score_batch(boards):
+    """
+    calculate_score dla całego stosu plansz (N, 4, 4) w jednym przebiegu.
+    """
+    empty_counts = np.sum(boards == 0, axis=(1, 2))
+
+    scores = np.sum(boards * WEIGHT_MATRIX, axis=(1, 2))
+
+    left_diff = boards[:, :, :-1] - boards[:, :, 1:]
+    up_diff   = boards[:, :-1, :] - boards[:, 1:, :]
+
+    monotonicity_scores = -np.sum(np.abs(left_diff), axis=(1, 2)) - np.sum(np.abs(up_diff), axis=(1, 2))
+
+    scores = scores + monotonicity_scores * MONOTONICITY_WEIGHT + empty_counts * EMPTY_CELL_BONUS
+    return np.where(empty_counts == 0, -1e9, scores)
+
+# calculate_score split into per-row and per-column lookup tables over the
+# bitboard encoding; gives exactly the same values, calculate_score stays
+# as the reference implementation
+SCORE_TABLES = build_score_tables(WEIGHT_MATRIX, MONOTONICITY_WEIGHT, EMPTY_CELL_BONUS)
+
+def table_calculate_score(board):
+    return table_score_array(board, SCORE_TABLES)
+
+def rebuild_score_tables():
+    """
+    Do wywołania po zmianie WEIGHT_MATRIX, MONOTONICITY_WEIGHT albo EMPTY_CELL_BONUS.
+    """
+    global SCORE_TABLES
+    SCORE_TABLES = build_score_tables(WEIGHT_MATRIX, MONOTONICITY_WEIGHT, EMPTY_CELL_BONUS)
+
+def check_score_tables(samples=10000, seed=0):
+    """
+    Sprawdza na losowych planszach, że table_calculate_score == calculate_score.
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(samples):
+        board = np.where(rng.random((4, 4)) < 0.3, 0, 2 ** rng.integers(1, 16, (4, 4)))
+        if rng.random() < 0.1:
+            board[board == 0] = 2
+        expected = calculate_score(board)
+        actual = table_calculate_score(board)
+        if expected != actual:
+            raise AssertionError(f"Table score {actual} != {expected} for\n{board}")
+
+def value_upper_bound(tile_sum, depth):
+    """
+    Górne ograniczenie wartości węzła o danej sumie kafelków i głębokości.
+
+    Każdy węzeł losowy dokłada najwyżej 4 do sumy kafelków, każdy ruch gracza
+    daje najwyżej tyle punktów, ile wynosi suma kafelków, a liść z
+    calculate_score nie przekracza sum * max(WEIGHT_MATRIX) plus premii za
+    16 pustych pól (monotoniczność jest zawsze <= 0, o ile
+    MONOTONICITY_WEIGHT >= 0).
+    """
+    max_tile_sum = tile_sum + 4 * depth
+    leaf_bound = max_tile_sum * int(WEIGHT_MATRIX.max()) + 16 * EMPTY_CELL_BONUS
+    return leaf_bound + depth * max_tile_sum * 10
+
+# leaf evaluator used by expectimax, and its (N, 4, 4) stack version used
+# with BATCHED_LEAVES; replace both together
+EVALUATOR = table_calculate_score
+BATCH_EVALUATOR = calculate_score_batch
+# (tile sum, depth) -> bound on node values under EVALUATOR, for the Star1
+# cuts; None turns the cuts off for an evaluator without a known bound
+VALUE_UPPER_BOUND = value_upper_bound
+
+_NO_ALPHA = -float('inf')
+
+def expectimax(board, depth, is_player_turn, table=None, probability=1.0, fours=0, alpha=_NO_ALPHA):
+    """
+    Wartość węzła. Z alpha (STAR1_PRUNING) wartość większa od alpha jest
+    dokładna, a wartość <= alpha może być tylko górnym ograniczeniem.
+    """
+    if table is None:
+        return _expectimax_node(board, depth, is_player_turn, None, probability, fours, alpha)
+
+    # entries keep the probability they were searched with: a lower one
+    # means more of the subtree was cut off by PROBABILITY_CUTOFF, so an
+    # entry is reused only for a path at most as likely as its own; a Star1
+    # bound is reused only where it still cuts
+    board_key = canonical_key(board) if CANONICAL_TABLE_KEYS else board.tobytes()
+    key = (board_key, depth, is_player_turn, _four_allowance(depth, is_player_turn, fours))
+    cached = table.get(key, lambda entry: entry[1] >= probability and (not entry[2] or entry[0] <= alpha))
+    if cached is not None:
+        return cached[0]
+
+    score = _expectimax_node(board, depth, is_player_turn, table, probability, fours, alpha)
+    table.put(key, depth, (score, probability, score <= alpha))
+    return score
+
+def _four_allowance(depth, is_player_turn, fours):
+    # 4-tile spawns the subtree may still expand; beyond the number of chance
+    # levels left the limit no longer changes the subtree
+    chance_levels = depth // 2 if is_player_turn else (depth + 1) // 2
+    return min(max(MAX_FOUR_SPAWNS - fours, 0), chance_levels)
+
+def _expectimax_node(board, depth, is_player_turn, table, probability, fours, alpha):
+    if _search_deadline is not None and time.perf_counter() > _search_deadline:
+        raise _SearchTimeout()
+
     if depth == 0:
-        return calculate_score(board)
+        return EVALUATOR(board)
+
+    if _stats is not None:
+        _stats.count_node("player" if is_player_turn else "chance", depth)
 
     if is_player_turn:
-        moves = [move_up, move_down, move_left, move_right]
+        if depth >= _scratch.max_depth:
+            _scratch.ensure(depth)
+        new_boards = _scratch.successors[depth]
+        move_scores = _scratch.scores[depth]
+        legal = _scratch.legal[depth]
+        generate_moves_into(board, _scratch.flats[depth], move_scores, legal)
         best_score = -float('inf')
         
-        for func in moves:
-            new_board, valid, moves_score = func(board)
-            
-            if valid:
-                future_score = expectimax(new_board, depth - 1, False)
+        for move in range(POSSIBLE_MOVES_COUNT):
+            if legal[move]:
+                moves_score = move_scores[move] * 10
+                # a later move only matters if it beats the best one so far
+                child_alpha = max(alpha, best_score) - moves_score if STAR1_PRUNING else alpha
+                future_score = expectimax(new_boards[move], depth - 1, False, table, probability, fours, child_alpha)
                 
-                total_score = future_score + (moves_score * 10)
+                total_score = future_score + moves_score
                 
                 if total_score > best_score:
                     best_score = total_score
@@ -61,70 +237,432 @@ def expectimax(board, depth, is_player_turn):
         return best_score
 
     else:
+        if probability < PROBABILITY_CUTOFF:
+            return EVALUATOR(board)
+
         empty_indices = list(zip(*np.where(board == 0)))
         
         if not empty_indices:
-            return calculate_score(board)
+            return EVALUATOR(board)
 
-        if len(empty_indices) > 3:
-            idxs = np.random.choice(len(empty_indices), 3, replace=False)
-            search_cells = [empty_indices[i] for i in idxs]
-        else:
-            search_cells = empty_indices
+        if alpha != _NO_ALPHA and VALUE_UPPER_BOUND is not None:
+            return _star1_chance_node(board, depth, table, probability, fours, alpha, empty_indices)
 
         avg_score = 0
-        weight_sum = 0
+        branches = _spawn_branches(len(empty_indices), probability, fours)
         
-        for r, c in search_cells:
-            board[r][c] = 2
-            avg_score += 0.9 * expectimax(board, depth - 1, True)
-            
-            board[r][c] = 4
-            avg_score += 0.1 * expectimax(board, depth - 1, True)
+        for r, c in empty_indices:
+            for tile, weight, child_probability, child_fours in branches:
+                board[r][c] = tile
+                avg_score += weight * expectimax(board, depth - 1, True, table, child_probability, child_fours)
             
             board[r][c] = 0
-            weight_sum += 1
 
-        return avg_score / weight_sum
+        return avg_score / len(empty_indices)
+
+def _star1_chance_node(board, depth, table, probability, fours, alpha, empty_indices):
+    """
+    Węzeł losowy z cięciem Star1: po każdym dziecku sprawdza, czy średnia,
+    nawet z pozostałymi dziećmi na VALUE_UPPER_BOUND, może jeszcze
+    przekroczyć alpha. Jeśli nie, zwraca to ograniczenie.
+    """
+    cell_count = len(empty_indices)
+    branches = _spawn_branches(cell_count, probability, fours)
+    upper = VALUE_UPPER_BOUND(int(board.sum()) + 4, depth - 1)
+    remaining = float(cell_count)
+    avg_score = 0
+
+    for r, c in empty_indices:
+        for tile, weight, child_probability, child_fours in branches:
+            remaining -= weight
+            child_alpha = (alpha * cell_count - avg_score - remaining * upper) / weight
+            child_alpha -= PRUNING_TOLERANCE * abs(child_alpha)
+
+            board[r][c] = tile
+            value = expectimax(board, depth - 1, True, table, child_probability, child_fours, child_alpha)
+            avg_score += weight * value
+
+            if value <= child_alpha:
+                board[r][c] = 0
+                return (avg_score + remaining * upper) / cell_count
+
+        board[r][c] = 0
+
+    return avg_score / cell_count
+
+def _spawn_branches(cell_count, probability, fours):
+    """
+    Możliwe kafelki w jednym polu węzła losowego: (kafelek, waga,
+    prawdopodobieństwo dojścia do dziecka, liczba czwórek na ścieżce).
+    Po MAX_FOUR_SPAWNS czwórkach rozwijana jest już tylko dwójka.
+    """
+    cell_probability = probability / cell_count
+    if fours >= MAX_FOUR_SPAWNS:
+        return [(2, 1.0, cell_probability, fours)]
+    return [
+        (2, 0.9, cell_probability * 0.9, fours),
+        (4, 0.1, cell_probability * 0.1, fours + 1),
+    ]
+
+# module settings the node values depend on; spawned workers import this
+# module with its defaults, so parallel jobs carry the parent's values
+SEARCH_SETTINGS = (
+    "EVALUATOR", "WEIGHT_MATRIX", "MONOTONICITY_WEIGHT", "EMPTY_CELL_BONUS",
+    "PROBABILITY_CUTOFF", "MAX_FOUR_SPAWNS", "CANONICAL_TABLE_KEYS",
+    "USE_TRANSPOSITION_TABLE", "KEEP_TABLE_BETWEEN_MOVES",
+    "STAR1_PRUNING", "VALUE_UPPER_BOUND",
+)
+_SCORE_TABLE_SETTINGS = ("WEIGHT_MATRIX", "MONOTONICITY_WEIGHT", "EMPTY_CELL_BONUS")
+
+def search_settings():
+    return {name: globals()[name] for name in SEARCH_SETTINGS}
+
+def _apply_search_settings(settings):
+    # tables are rebuilt only when the weights differ from the ones in use
+    rebuild = any(not np.array_equal(globals()[name], settings[name]) for name in _SCORE_TABLE_SETTINGS)
+    globals().update(settings)
+    if rebuild:
+        rebuild_score_tables()
+
+def _evaluate_spawns(jobs):
+    """
+    Zadanie dla procesu roboczego: wartości węzłów gracza dla listy
+    (ustawienia, plansza, głębokość, prawdopodobieństwo, liczba czwórek);
+    wszystkie zadania jednego kawałka mają te same ustawienia.
+    """
+    _apply_search_settings(jobs[0][0])
+    table = transposition_table if USE_TRANSPOSITION_TABLE else None
+    if table is not None and not KEEP_TABLE_BETWEEN_MOVES:
+        table.clear()
+    return [
+        expectimax(board, depth, True, table, probability, fours)
+        for _, board, depth, probability, fours in jobs
+    ]
+
+def _parallel_root_scores(root_boards, depth):
+    """
+    Liczy wartości węzłów losowych pod każdym ruchem z korzenia, rozdzielając
+    poddrzewa (ruch x pole x kafelek) między procesy.
+    """
+    settings = search_settings()
+    jobs = []
+    root_branches = []
+    for new_board in root_boards:
+        empty_indices = list(zip(*np.where(new_board == 0)))
+        branches = _spawn_branches(len(empty_indices), 1.0, 0) if empty_indices else []
+        root_branches.append((len(empty_indices), branches))
+        for r, c in empty_indices:
+            for tile, _, child_probability, child_fours in branches:
+                child = np.copy(new_board)
+                child[r][c] = tile
+                jobs.append((settings, child, depth - 1, child_probability, child_fours))
+
+    values = iter(map_chunked(_evaluate_spawns, jobs))
+    scores = []
+    for new_board, (cell_count, branches) in zip(root_boards, root_branches):
+        if cell_count == 0:
+            scores.append(EVALUATOR(new_board))
+            continue
+        avg_score = 0
+        for _ in range(cell_count):
+            for _, weight, _, _ in branches:
+                avg_score += weight * next(values)
+        scores.append(avg_score / cell_count)
+    return scores
 
-def ai_move(board, searches_per_move, search_length):
+def _plan_search(board, depth, is_player_turn, leaves, probability=1.0, fours=0):
+    """
+    Przechodzi drzewo jak expectimax, ale zamiast oceniać liście odkłada
+    ich kopie do leaves. Zwraca plan węzła: indeks liścia, ("max", dzieci)
+    albo ("chance", liczba pól, dzieci) do późniejszego _back_up.
+    """
+    if depth == 0:
+        leaves.append(np.copy(board))
+        return len(leaves) - 1
+
+    if _stats is not None:
+        _stats.count_node("player" if is_player_turn else "chance", depth)
+
+    if is_player_turn:
+        new_boards, move_scores, legal = generate_moves(board)
+        children = []
+        for move in range(POSSIBLE_MOVES_COUNT):
+            if legal[move]:
+                child = _plan_search(new_boards[move], depth - 1, False, leaves, probability, fours)
+                children.append((move_scores[move] * 10, child))
+        return ("max", children)
+
+    empty_indices = list(zip(*np.where(board == 0)))
+    if probability < PROBABILITY_CUTOFF or not empty_indices:
+        leaves.append(np.copy(board))
+        return len(leaves) - 1
+
+    branches = _spawn_branches(len(empty_indices), probability, fours)
+    children = []
+    for r, c in empty_indices:
+        for tile, weight, child_probability, child_fours in branches:
+            board[r][c] = tile
+            children.append((weight, _plan_search(board, depth - 1, True, leaves, child_probability, child_fours)))
+        board[r][c] = 0
+    return ("chance", len(empty_indices), children)
+
+def _back_up(plan, leaf_scores):
+    if isinstance(plan, int):
+        return leaf_scores[plan]
+
+    if plan[0] == "max":
+        best_score = -float('inf')
+        for bonus, child in plan[1]:
+            total_score = _back_up(child, leaf_scores) + bonus
+            if total_score > best_score:
+                best_score = total_score
+        return best_score
+
+    _, cell_count, children = plan
+    avg_score = 0
+    for weight, child in children:
+        avg_score += weight * _back_up(child, leaf_scores)
+    return avg_score / cell_count
+
+def _batched_root_scores(root_boards, depth):
+    """
+    Wyniki ruchów z korzenia z jedną oceną wszystkich liści naraz.
+    """
+    leaves = []
+    plans = [_plan_search(new_board, depth, False, leaves) for new_board in root_boards]
+    leaf_scores = BATCH_EVALUATOR(np.stack(leaves)).tolist() if leaves else []
+    return [_back_up(plan, leaf_scores) for plan in plans]
+
+def search_fingerprint():
+    """
+    Skrót ustawień, od których zależą wartości w magazynie pozycji:
+    oceny, wag calculate_score, PROBABILITY_CUTOFF i MAX_FOUR_SPAWNS.
+    Ocena będąca metodą obiektu z metodą fingerprint() (np. NTupleNetwork)
+    jest rozpoznawana po jej wyniku, inna po nazwie.
+    """
+    owner = getattr(EVALUATOR, "__self__", None)
+    evaluator = (getattr(EVALUATOR, "__module__", None), getattr(EVALUATOR, "__qualname__", repr(EVALUATOR)))
+    if hasattr(owner, "fingerprint"):
+        evaluator += (owner.fingerprint(),)
+    settings = (
+        evaluator, WEIGHT_MATRIX.tolist(), MONOTONICITY_WEIGHT, EMPTY_CELL_BONUS,
+        PROBABILITY_CUTOFF, MAX_FOUR_SPAWNS,
+    )
+    return hashlib.sha256(repr(settings).encode()).digest()
+
+def open_position_store(path=None, writable=None):
+    """
+    Otwiera magazyn pozycji (domyślnie POSITION_STORE_PATH) dla ai_move.
+    Magazyn zapełniony przy innych ustawieniach (search_fingerprint) nie
+    zostanie otwarty; po zmianie ustawień trzeba otworzyć go ponownie.
+    """
+    global position_store
+    if path is None:
+        path = POSITION_STORE_PATH
+    if writable is None:
+        writable = POSITION_STORE_WRITABLE
+    position_store = PositionStore.open(path, writable=writable, fingerprint=search_fingerprint())
+    return position_store
+
+def close_position_store():
+    global position_store
+    if position_store is not None:
+        position_store.flush()
+        position_store = None
+
+def _search_root_scores(root_boards, depth, table, parallel, empty_cells=None):
+    """
+    Wyniki ruchów z korzenia. Z empty_cells i STAR1_PRUNING ruchy, które nie
+    mogą pobić wcześniejszych, dostają tylko górne ograniczenie.
+    """
+    if parallel:
+        return _parallel_root_scores(root_boards, depth)
+    if BATCHED_LEAVES:
+        return _batched_root_scores(root_boards, depth)
+    if STAR1_PRUNING and empty_cells is not None:
+        bonuses = [root_bonus(new_board, empty_cells) for new_board in root_boards]
+        return _star1_root_scores(root_boards, depth, table, bonuses)
+    return [expectimax(new_board, depth, False, table) for new_board in root_boards]
+
+def _star1_root_scores(root_boards, depth, table, bonuses, order=None):
+    """
+    Wyniki ruchów z korzenia liczone w kolejności order, każdy z alpha
+    równym najlepszemu dotąd wynikowi z premią root_bonus. Wynik ruchu,
+    który nie może go pobić, jest tylko ograniczeniem <= alpha, więc
+    pick_move i tak go nie wybierze.
+    """
+    if order is None:
+        order = range(len(root_boards))
+    scores = [None] * len(root_boards)
+    best_total = _NO_ALPHA
+    for i in order:
+        scores[i] = expectimax(root_boards[i], depth, False, table, alpha=best_total - bonuses[i])
+        best_total = max(best_total, scores[i] + bonuses[i])
+    return scores
+
+def _stored_root_scores(root_boards, depth, table, parallel):
+    """
+    Bierze wyniki znanych pozycji z magazynu, szuka tylko pozostałych
+    i, jeśli magazyn jest zapisywalny, dopisuje je.
+    """
+    scores = [position_store.get(new_board, depth) for new_board in root_boards]
+    missing = [i for i, score in enumerate(scores) if score is None]
+    if missing:
+        # without empty_cells no root move gets a Star1 bound, so every
+        # searched score is exact and can be stored
+        searched = _search_root_scores([root_boards[i] for i in missing], depth, table, parallel)
+        for i, score in zip(missing, searched):
+            scores[i] = score
+            if position_store.writable:
+                position_store.put(root_boards[i], depth, score)
+    return scores
+
+def _iterative_deepening_scores(root_boards, time_budget_ms, table, empty_cells):
+    """
+    Przeszukuje z rosnącą głębokością, dopóki starcza czasu, i zwraca wyniki
+    ruchów z najgłębszej ukończonej iteracji. Z STAR1_PRUNING kolejna
+    iteracja zaczyna od ruchów najlepszych w poprzedniej, żeby alpha od
+    razu była wysoka; bez cięć kolejność nie ma wpływu na wynik ani czas.
+    """
+    global _search_deadline
+    start = time.perf_counter()
+    deadline = start + time_budget_ms / 1000
+
+    # an aborted iteration can leave a spawned tile on the board it was
+    # searching, so the search runs on copies of the root boards
+    root_boards = [np.copy(new_board) for new_board in root_boards]
+    bonuses = [root_bonus(new_board, empty_cells) for new_board in root_boards]
+
+    # depth 1 always completes, so there is a move even with a tiny budget
+    scores = [expectimax(new_board, 1, False, table) for new_board in root_boards]
+    completed_depth = 1
+    last_duration = time.perf_counter() - start
+    previous_duration = None
+
+    depth = 2
+    while depth <= MAX_ITERATIVE_DEPTH:
+        now = time.perf_counter()
+        # skip an iteration that cannot finish, judging by how the last ones grew
+        growth = last_duration / previous_duration if previous_duration else 1.0
+        if now + last_duration * max(growth, 1.0) > deadline:
+            break
+
+        _search_deadline = deadline
+        try:
+            if STAR1_PRUNING:
+                order = sorted(range(len(root_boards)), key=lambda i: scores[i] + bonuses[i], reverse=True)
+                iteration_scores = _star1_root_scores(root_boards, depth, table, bonuses, order)
+            else:
+                iteration_scores = [expectimax(new_board, depth, False, table) for new_board in root_boards]
+        except _SearchTimeout:
+            break
+        finally:
+            _search_deadline = None
+
+        scores = iteration_scores
+        completed_depth = depth
+        previous_duration = last_duration
+        last_duration = time.perf_counter() - now
+        depth += 1
+
+    return scores, completed_depth
+
+# functions timed by SearchStats while INSTRUMENT_SEARCH is on
+_TIMED_FUNCTIONS = {
+    "generate_moves": ("move_generation", False),
+    "generate_moves_into": ("move_generation", False),
+    "EVALUATOR": ("evaluation", False),
+    "BATCH_EVALUATOR": ("evaluation", True),
+}
+
+def ai_move(board, searches_per_move, search_length, parallel=None, time_budget_ms=None):
     """
     Główna funkcja sterująca.
     """
-    possible_moves = [move_up, move_down, move_left, move_right]
-    best_move_result = None
-    best_score = -float('inf')
-    
+    if parallel is None:
+        parallel = PARALLEL_SEARCH
+    # opened before the instrumentation wraps EVALUATOR, which would change
+    # the fingerprint
+    if position_store is None and POSITION_STORE_PATH is not None:
+        open_position_store()
+    if not INSTRUMENT_SEARCH:
+        return _search_move(board, parallel, time_budget_ms)
+
+    table_lookups = (transposition_table.hits, transposition_table.misses)
+    store_lookups = (position_store.hits, position_store.misses) if position_store is not None else (0, 0)
+    with instrumented(globals(), _TIMED_FUNCTIONS, "EVALUATOR" if parallel else None) as stats:
+        try:
+            return _search_move(board, parallel, time_budget_ms)
+        finally:
+            stats.cache_hits = transposition_table.hits - table_lookups[0]
+            stats.cache_misses = transposition_table.misses - table_lookups[1]
+            if position_store is not None:
+                stats.cache_hits += position_store.hits - store_lookups[0]
+                stats.cache_misses += position_store.misses - store_lookups[1]
+
+def _search_move(board, parallel, time_budget_ms):
+    global last_search_depth
+    if time_budget_ms is None:
+        time_budget_ms = TIME_BUDGET_MS
     empty_cells = get_empty_cells_count(board)
-    current_depth = MAX_DEPTH
-    if empty_cells < 2:
-        current_depth = 4 
+    current_depth = search_depth(empty_cells)
+
+    table = transposition_table if USE_TRANSPOSITION_TABLE else None
+    if table is not None and not KEEP_TABLE_BETWEEN_MOVES:
+        table.clear()
 
-    valid_moves_found = 0
+    valid_moves = root_moves(board)
+    root_boards = [new_board for new_board, _ in valid_moves]
+    if time_budget_ms is not None and root_boards:
+        root_scores, last_search_depth = _iterative_deepening_scores(root_boards, time_budget_ms, table, empty_cells)
+    elif position_store is not None and root_boards:
+        root_scores = _stored_root_scores(root_boards, current_depth, table, parallel)
+        last_search_depth = current_depth
+    else:
+        root_scores = _search_root_scores(root_boards, current_depth, table, parallel, empty_cells) if root_boards else []
+        last_search_depth = current_depth
 
-    for func in possible_moves:
-        sim_board = np.copy(board)
-        new_board, valid, move_points = func(sim_board)
+    return pick_move(board, valid_moves, root_scores, empty_cells)
 
-        if valid:
-            valid_moves_found += 1
-            score = expectimax(new_board, current_depth, False)
-            
-            if get_empty_cells_count(new_board) > empty_cells:
-                score += 1000000 
+def search_depth(empty_cells):
+    # one ply deeper than usual, whatever MAX_DEPTH is, so a threshold tuned
+    # at TUNING_DEPTH means the same at the playing depth
+    if empty_cells < SURVIVAL_THRESHOLD:
+        return MAX_DEPTH + 1
+    return MAX_DEPTH
 
-            if score > best_score:
-                best_score = score
-                best_move_result = (new_board, True, move_points)
+def root_moves(board):
+    """
+    Lista (plansza po ruchu, punkty) dla dozwolonych ruchów, w kolejności ruchów gracza.
+    """
+    new_boards, move_scores, legal = generate_moves(board)
+    return [(new_boards[move], move_scores[move]) for move in range(POSSIBLE_MOVES_COUNT) if legal[move]]
 
-    if best_move_result is None and valid_moves_found > 0:
-        for func in possible_moves:
-            sim_board = np.copy(board)
-            new_board, valid, move_points = func(sim_board)
-            if valid:
-                return new_board, True, move_points
+def root_bonus(new_board, empty_cells):
+    if get_empty_cells_count(new_board) > empty_cells:
+        return 1000000
+    return 0
+
+def pick_move(board, valid_moves, root_scores, empty_cells):
+    best_move_result = None
+    best_score = -float('inf')
+
+    for (new_board, move_points), score in zip(valid_moves, root_scores):
+        score += root_bonus(new_board, empty_cells)
+
+        if score > best_score:
+            best_score = score
+            best_move_result = (new_board, True, move_points)
+
+    if best_move_result is None and valid_moves:
+        new_board, move_points = valid_moves[0]
+        return new_board, True, move_points
 
     if best_move_result is None:
         return board, False, 0
 
-    return best_move_result
\ No newline at end of file
+    return best_move_result
+
+if __name__ == "__main__":
+    check_score_tables()
+    print("score tables match calculate_score")
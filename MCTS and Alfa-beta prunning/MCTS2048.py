@@ -1,34 +1,361 @@
 import numpy as np
 
-from game_functions import initialize_game, move_down, move_left, move_right, move_up, add_new_tile, check_for_win, random_move
+from game_functions import add_new_tile
+from game_functions import generate_moves, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT, MOVE_UP
+from game_functions import generate_moves_into, add_new_tile_inplace, ScratchArena, POSSIBLE_MOVES_COUNT
+from game_functions import move_batch, legal_moves_batch, random_moves_batch, add_new_tile_batch
+from game_functions import NEW_TILE_DISTRIBUTION
+from bitboard import to_bitboard, to_array
+from node_pool import NodePool, UNEXPANDED, TERMINAL, ILLEGAL_MOVE
+from parallel_search import WORKER_COUNT, map_chunked
+from search_stats import instrumented
 
-def ai_move(board, searches_per_move, search_length):
-    first_moves = [move_down, move_left, move_right, move_up]
+# play all rollouts of a root move together as one (N, 4, 4) stack
+BATCHED_ROLLOUTS = True
+# split the rollouts of every root move across the parallel_search process pool
+PARALLEL_SEARCH = False
+# real tree search (UCT selection, chance nodes for spawns) instead of flat
+# Monte Carlo; searches_per_move * 4 iterations, so the rollout count matches
+UCT_SEARCH = False
+UCT_EXPLORATION = 1.0
+# keep the subtree below the played move and spawn for the next ai_move
+REUSE_TREE = True
+# truncated rollouts: stop after ROLLOUT_PLIES random moves (None plays
+# up to search_length) and add ROLLOUT_BOOTSTRAP_WEIGHT * ROLLOUT_EVALUATOR(board)
+# for the final board, e.g. Expectimax2048.calculate_score; the weight
+# converts evaluator units into merge points
+ROLLOUT_PLIES = None
+ROLLOUT_EVALUATOR = None
+ROLLOUT_BOOTSTRAP_WEIGHT = 1.0
+# hard cap on the UCT tree size; about 30 bytes per node
+NODE_POOL_CAPACITY = 1 << 18
+# record search_stats counters for every ai_move into last_search_stats;
+# rollouts done by the process pool are not counted
+INSTRUMENT_SEARCH = False
+
+# SearchStats of the running ai_move, and the summary of the last one
+_stats = None
+last_search_stats = None
+
+# reusable buffers for the serial rollouts: the rollout board and its successors
+_scratch = ScratchArena(0)
+_search_board = np.zeros((4, 4), dtype="int")
+_search_flat = _search_board.reshape(16)
+
+def serial_rollouts(first_board, searches_per_move, search_length, evaluator=None, weight=1.0):
+    new_boards = _scratch.successors[0]
+    move_scores = _scratch.scores[0]
+    legal = _scratch.legal[0]
+    total_score = 0
+    plies = 0
+    for later_moves in range(searches_per_move):
+        move_number = 1
+        np.copyto(_search_board, first_board)
+        
+        while move_number < search_length:
+            legal_count = generate_moves_into(_search_board, _scratch.flats[0], move_scores, legal)
+            if legal_count == 0:
+                break
+            choice = np.random.randint(0, legal_count)
+            for move in range(POSSIBLE_MOVES_COUNT):
+                if legal[move]:
+                    if choice == 0:
+                        break
+                    choice -= 1
+            np.copyto(_search_board, new_boards[move])
+            add_new_tile_inplace(_search_flat)
+            total_score += move_scores[move]
+            move_number += 1
+        plies += move_number - 1
+        if evaluator is not None:
+            total_score += weight * evaluator(_search_board)
+    if _stats is not None:
+        _stats.count_rollouts(searches_per_move, plies)
+    return total_score
+
+def _bootstrap_total(boards, evaluator, weight):
+    if evaluator is None:
+        return 0
+    return weight * sum(evaluator(board) for board in boards)
+
+def batched_rollouts(first_board, searches_per_move, search_length, evaluator=None, weight=1.0):
+    """
+    Rozgrywa searches_per_move losowych symulacji naraz i zwraca sumę
+    zdobytych punktów. Zakończone symulacje są usuwane ze stosu;
+    z evaluator ich końcowe plansze są najpierw oceniane.
+    """
+    boards = np.repeat(first_board[np.newaxis], searches_per_move, axis=0)
+    total_score = 0
+    plies = 0
+
+    for _ in range(search_length - 1):
+        legal = legal_moves_batch(boards)
+        alive = legal.any(axis=1)
+        if not alive.all():
+            total_score += _bootstrap_total(boards[~alive], evaluator, weight)
+            boards = boards[alive]
+            legal = legal[alive]
+        if len(boards) == 0:
+            break
+
+        moves = random_moves_batch(legal)
+        boards, _, move_scores = move_batch(boards, moves)
+        boards = add_new_tile_batch(boards)
+        total_score += move_scores.sum()
+        plies += len(boards)
+
+    if _stats is not None:
+        _stats.count_rollouts(searches_per_move, plies)
+    return total_score + _bootstrap_total(boards, evaluator, weight)
+
+def _rollout_jobs(jobs):
+    """
+    Zadanie dla procesu roboczego: suma punktów symulacji dla listy
+    (plansza, liczba symulacji, długość, batched, evaluator, waga).
+    """
+    results = []
+    for first_board, count, search_length, batched, evaluator, weight in jobs:
+        rollouts = batched_rollouts if batched else serial_rollouts
+        results.append(rollouts(first_board, count, search_length, evaluator, weight))
+    return results
+
+def _rollout_settings(search_length):
+    """
+    Długość symulacji po ucięciu do ROLLOUT_PLIES ruchów oraz ocena
+    i waga końcowej planszy.
+    """
+    if ROLLOUT_PLIES is not None:
+        search_length = min(search_length, ROLLOUT_PLIES + 1)
+    return search_length, ROLLOUT_EVALUATOR, ROLLOUT_BOOTSTRAP_WEIGHT
+
+def _parallel_rollout_scores(first_boards, searches_per_move, search_length, batched, evaluator=None, weight=1.0):
+    jobs = []
+    owners = []
+    parts = min(WORKER_COUNT, searches_per_move)
+    for index, first_board in enumerate(first_boards):
+        for part in range(parts):
+            count = searches_per_move // parts + (1 if part < searches_per_move % parts else 0)
+            jobs.append((first_board, count, search_length, batched, evaluator, weight))
+            owners.append(index)
+
+    totals = np.zeros(len(first_boards))
+    for index, total in zip(owners, map_chunked(_rollout_jobs, jobs)):
+        totals[index] += total
+    return totals
+
+def _spawn_index(empty_count):
+    # index of a sampled spawn among the children of a chance node:
+    # all 2-tiles in cell order, then all 4-tiles
+    value_draw, cell_draw = np.random.random(), np.random.random()
+    tile_value = NEW_TILE_DISTRIBUTION.item(int(value_draw * len(NEW_TILE_DISTRIBUTION)))
+    rank = int(cell_draw * empty_count)
+    return rank + (empty_count if tile_value == 4 else 0)
+
+def _expand_decision(pool, node):
+    board = to_array(int(pool.keys[node]))
+    new_boards, move_scores, legal = generate_moves(board)
+    if not legal.any():
+        pool.first_child[node] = TERMINAL
+        return True
+    first = pool.allocate(POSSIBLE_MOVES_COUNT)
+    if first < 0:
+        return False
+    for move in range(POSSIBLE_MOVES_COUNT):
+        pool.keys[first + move] = to_bitboard(new_boards[move])
+        pool.move_scores[first + move] = move_scores[move] if legal[move] else ILLEGAL_MOVE
+    pool.first_child[node] = first
+    pool.child_count[node] = POSSIBLE_MOVES_COUNT
+    return True
+
+def _expand_chance(pool, node):
+    afterstate = to_array(int(pool.keys[node]))
+    empty = np.flatnonzero(afterstate == 0)
+    first = pool.allocate(2 * len(empty))
+    if first < 0:
+        return False
+    key = int(pool.keys[node])
+    for rank, cell in enumerate(empty.tolist()):
+        pool.keys[first + rank] = key | (1 << (4 * cell))
+        pool.keys[first + len(empty) + rank] = key | (2 << (4 * cell))
+    pool.first_child[node] = first
+    pool.child_count[node] = 2 * len(empty)
+    return True
+
+def _select_child(pool, node):
+    """
+    UCT po dozwolonych ruchach węzła gracza; nieodwiedzone ruchy idą
+    pierwsze, a średnie wyniki są skalowane do [0, 1] względem rodzeństwa,
+    bo sumy punktów nie mają stałego zakresu.
+    """
+    first = int(pool.first_child[node])
+    children = slice(first, first + POSSIBLE_MOVES_COUNT)
+    legal = pool.move_scores[children] != ILLEGAL_MOVE
+    visits = pool.visits[children]
+    unvisited = np.flatnonzero(legal & (visits == 0))
+    if len(unvisited):
+        return first + int(unvisited[0])
+
+    means = np.where(legal, pool.value_sums[children] / np.maximum(visits, 1), 0)
+    low = means[legal].min()
+    high = means[legal].max()
+    spread = high - low if high > low else 1.0
+    explore = UCT_EXPLORATION * np.sqrt(np.log(pool.visits[node]) / np.maximum(visits, 1))
+    values = np.where(legal, (means - low) / spread + explore, -np.inf)
+    return first + int(np.argmax(values))
+
+def _leaf_value(board, search_length):
+    return serial_rollouts(board, 1, *_rollout_settings(search_length))
+
+def _terminal_value(board):
+    # a lost position is worth what a rollout ending on it would add
+    _, evaluator, weight = _rollout_settings(0)
+    return _bootstrap_total([board], evaluator, weight)
+
+def _uct_iteration(pool, root, search_length):
+    path = [root]
+    node = root
+
+    while True:
+        if pool.first_child[node] == UNEXPANDED:
+            if not _expand_decision(pool, node):
+                # pool is full: evaluate the leaf without growing the tree
+                value = _leaf_value(to_array(int(pool.keys[node])), search_length)
+                break
+            if _stats is not None:
+                _stats.count_node("decision", len(path) - 1)
+        if pool.first_child[node] == TERMINAL:
+            value = _terminal_value(to_array(int(pool.keys[node])))
+            break
+
+        chance = _select_child(pool, node)
+        path.append(chance)
+        if pool.first_child[chance] == UNEXPANDED:
+            if not _expand_chance(pool, chance):
+                board = add_new_tile(to_array(int(pool.keys[chance])))
+                value = _leaf_value(board, search_length)
+                break
+            if _stats is not None:
+                _stats.count_node("chance", len(path) - 1)
+
+        node = int(pool.first_child[chance]) + _spawn_index(int(pool.child_count[chance]) // 2)
+        path.append(node)
+        if pool.visits[node] == 0:
+            value = _leaf_value(to_array(int(pool.keys[node])), search_length)
+            break
+
+    # walk back adding the merge score of every move on the path; chance
+    # nodes sit at the odd positions
+    for depth in range(len(path) - 1, -1, -1):
+        node = path[depth]
+        if depth % 2:
+            value += int(pool.move_scores[node])
+        pool.visits[node] += 1
+        pool.value_sums[node] += value
+
+# the search tree and the chance node of the move played from its root
+_node_pool = None
+_played_chance = -1
+
+def _search_root(board):
+    """
+    Korzeń dla planszy: poddrzewo z poprzedniego ruchu, jeśli plansza jest
+    jednym z jego wyników i zostawia co najmniej połowę puli wolną, albo
+    nowy węzeł.
+    """
+    global _node_pool
+    if _node_pool is None or _node_pool.capacity != NODE_POOL_CAPACITY:
+        _node_pool = NodePool(NODE_POOL_CAPACITY)
+    key = to_bitboard(board)
+    if REUSE_TREE and _played_chance >= 0:
+        root = _node_pool.find_child(_played_chance, key)
+        if root >= 0:
+            root = _node_pool.compact(root)
+            if _node_pool.free() >= _node_pool.capacity // 2:
+                return root
+    return _node_pool.new_root(key)
+
+def uct_ai_move(board, searches_per_move, search_length):
+    """
+    MCTS z wyborem UCT i węzłami losowymi na planszach kolejnych dołożeń
+    kafelka. Drzewo żyje w NodePool; po ruchu zostaje zapamiętany węzeł
+    zagranego ruchu, żeby przy następnym wywołaniu zacząć od poddrzewa
+    planszy, która faktycznie wypadła.
+    """
+    global _played_chance
+    pool_root = _search_root(board)
+    pool = _node_pool
+
+    for _ in range(searches_per_move * POSSIBLE_MOVES_COUNT):
+        _uct_iteration(pool, pool_root, search_length)
+
+    first = int(pool.first_child[pool_root])
+    if first < 0:
+        _played_chance = -1
+        return board, False, 0
+
+    visits = np.where(pool.move_scores[first:first + POSSIBLE_MOVES_COUNT] != ILLEGAL_MOVE,
+                      pool.visits[first:first + POSSIBLE_MOVES_COUNT], -1)
+    _played_chance = first + int(np.argmax(visits))
+    return to_array(int(pool.keys[_played_chance])), True, int(pool.move_scores[_played_chance])
+
+# functions timed by SearchStats while INSTRUMENT_SEARCH is on
+_TIMED_FUNCTIONS = {
+    "generate_moves": ("move_generation", False),
+    "generate_moves_into": ("move_generation", False),
+    "move_batch": ("move_generation", False),
+    "legal_moves_batch": ("move_generation", False),
+    "add_new_tile": ("spawning", False),
+    "add_new_tile_inplace": ("spawning", False),
+    "add_new_tile_batch": ("spawning", False),
+    "ROLLOUT_EVALUATOR": ("evaluation", False),
+}
+
+def ai_move(board, searches_per_move, search_length, batched=None, parallel=None, uct=None):
+    if batched is None:
+        batched = BATCHED_ROLLOUTS
+    if parallel is None:
+        parallel = PARALLEL_SEARCH
+    if not INSTRUMENT_SEARCH:
+        return _search_move(board, searches_per_move, search_length, batched, parallel, uct)
+
+    with instrumented(globals(), _TIMED_FUNCTIONS, "ROLLOUT_EVALUATOR" if parallel else None):
+        return _search_move(board, searches_per_move, search_length, batched, parallel, uct)
+
+def _search_move(board, searches_per_move, search_length, batched, parallel, uct):
+    if uct is None:
+        uct = UCT_SEARCH
+    if uct:
+        return uct_ai_move(board, searches_per_move, search_length)
+    search_length, evaluator, weight = _rollout_settings(search_length)
+    first_moves = [MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT, MOVE_UP]
     scores = np.zeros(4)
+    pending = []
+    new_boards, move_scores, legal = generate_moves(board)
 
     for first_index in range(4):
         first_move = first_moves[first_index]
-        first_board, first_valid, first_score = first_move(board)
 
-        if first_valid:
-            first_board = add_new_tile(first_board)
-            scores[first_index] += first_score
+        if legal[first_move]:
+            first_board = add_new_tile(np.copy(new_boards[first_move]))
+            scores[first_index] += move_scores[first_move]
         else:
             continue
-        for later_moves in range(searches_per_move):
-            move_number = 1
-            search_board = np.copy(first_board)
-            is_valid = True
-            
-            while is_valid and move_number < search_length:
-                search_board, is_valid, score = random_move(search_board)
-                if is_valid:
-                    search_board = add_new_tile(search_board)
-                    scores[first_index] += score
-                    move_number += 1
-                
+        if parallel and searches_per_move > 0:
+            pending.append((first_index, first_board))
+        elif batched:
+            scores[first_index] += batched_rollouts(first_board, searches_per_move, search_length, evaluator, weight)
+        else:
+            scores[first_index] += serial_rollouts(first_board, searches_per_move, search_length, evaluator, weight)
+
+    if pending:
+        first_boards = [first_board for _, first_board in pending]
+        totals = _parallel_rollout_scores(first_boards, searches_per_move, search_length, batched, evaluator, weight)
+        for (first_index, _), total in zip(pending, totals):
+            scores[first_index] += total
+
+    # with ROLLOUT_EVALUATOR the legal moves can total below zero
+    scores[~legal[first_moves]] = -np.inf
     best_move_index = np.argmax(scores)
     best_move = first_moves[best_move_index]
-    final_board, position_valid, move_score = best_move(board)
     
-    return final_board, position_valid, move_score
\ No newline at end of file
+    return new_boards[best_move], bool(legal[best_move]), move_scores[best_move]
\ No newline at end of file
@@ -0,0 +1,193 @@
+import sys
+import json
+import time
+import argparse
+import platform
+
+import numpy as np
+
+import bitboard
+import Expectimax2048
+from bot_stats import CONFIGURATIONS
+from game_functions import initialize_game, add_new_tile, random_move, generate_moves
+from game_functions import move_up, move_down, move_left, move_right
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+POSITION_COUNT = 20
+POSITION_SEED = 0
+# micro benchmarks call each function on every position this many times,
+# and keep the fastest of MICRO_REPEATS such runs
+MICRO_ROUNDS = 50
+MICRO_REPEATS = 5
+# every position is searched this many times and its fastest run is kept,
+# which filters out scheduler noise better than the mean
+MACRO_REPEATS = 3
+# relative slowdown that compare reports as a regression
+REGRESSION_THRESHOLD = 0.10
+PERCENTILES = (50, 95, 99)
+
+
+def seeded_positions(count=POSITION_COUNT, seed=POSITION_SEED):
+    """
+    Pozycje z losowych gier o różnej długości, zawsze te same dla danego ziarna.
+    """
+    rng = np.random.default_rng(seed)
+    positions = []
+    while len(positions) < count:
+        board = add_new_tile(initialize_game(rng), rng)
+        for _ in range(int(rng.integers(0, 300))):
+            new_board, valid, _ = random_move(board, rng)
+            if not valid:
+                break
+            board = add_new_tile(new_board, rng)
+        if generate_moves(board)[2].any():
+            positions.append(board)
+    return positions
+
+
+def _micro_cases(positions):
+    bitboards = [bitboard.to_bitboard(board) for board in positions]
+    return [
+        ("move_up", move_up, positions),
+        ("move_down", move_down, positions),
+        ("move_left", move_left, positions),
+        ("move_right", move_right, positions),
+        ("generate_moves", generate_moves, positions),
+        ("bitboard.move_left", bitboard.move_left, bitboards),
+        ("add_new_tile", add_new_tile, None),
+        ("calculate_score", Expectimax2048.calculate_score, positions),
+        ("table_calculate_score", Expectimax2048.table_calculate_score, positions),
+    ]
+
+
+def _time_calls(func, arguments, copy):
+    if copy:
+        # add_new_tile fills a cell, so it gets fresh copies made outside the timing
+        arguments = [np.copy(board) for board in arguments]
+    start = time.perf_counter()
+    for argument in arguments:
+        func(argument)
+    return time.perf_counter() - start
+
+
+def run_micro(positions, rounds=MICRO_ROUNDS, repeats=MICRO_REPEATS):
+    """
+    Wywołania na sekundę dla funkcji silnika i oceny.
+    """
+    results = {}
+    for name, func, arguments in _micro_cases(positions):
+        copy = arguments is None
+        arguments = (positions if copy else arguments) * rounds
+        elapsed = min(_time_calls(func, arguments, copy) for _ in range(repeats))
+        results[name] = {"calls_per_sec": len(arguments) / elapsed}
+    return results
+
+
+def run_macro(positions, configurations=CONFIGURATIONS, repeats=MACRO_REPEATS):
+    """
+    Percentyle czasu ai_move (w ms) dla każdej konfiguracji z bot_stats.
+    """
+    results = {}
+    for name, module, spm, sl in configurations:
+        # warm-up: lazy tables, pools and caches are not part of a move
+        module.ai_move(np.copy(positions[0]), spm, sl)
+        latencies = []
+        for index, board in enumerate(positions):
+            runs = []
+            for _ in range(repeats):
+                np.random.seed(POSITION_SEED + index)
+                start = time.perf_counter()
+                module.ai_move(np.copy(board), spm, sl)
+                runs.append((time.perf_counter() - start) * 1000)
+            latencies.append(min(runs))
+        results[name] = {f"p{q}_ms": float(np.percentile(latencies, q)) for q in PERCENTILES}
+    return results
+
+
+def run_benchmarks(position_count=POSITION_COUNT, micro_only=False):
+    positions = seeded_positions(position_count)
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "positions": position_count,
+            "seed": POSITION_SEED,
+        },
+        "micro": run_micro(positions),
+        "macro": {} if micro_only else run_macro(positions),
+    }
+    return results
+
+
+def find_regressions(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Lista opisów wyników gorszych od bazowych o więcej niż threshold:
+    mniej wywołań na sekundę albo dłuższy czas ruchu.
+    """
+    regressions = []
+    for name, values in baseline.get("micro", {}).items():
+        if name in current.get("micro", {}):
+            old = values["calls_per_sec"]
+            new = current["micro"][name]["calls_per_sec"]
+            if new < old * (1 - threshold):
+                regressions.append(f"{name}: {old:.0f} -> {new:.0f} calls/s ({new / old - 1:+.1%})")
+    for name, values in baseline.get("macro", {}).items():
+        for metric, old in values.items():
+            new = current.get("macro", {}).get(name, {}).get(metric)
+            if new is not None and new > old * (1 + threshold):
+                regressions.append(f"{name} {metric}: {old:.1f} -> {new:.1f} ms ({new / old - 1:+.1%})")
+    return regressions
+
+
+def print_results(results):
+    for name, values in results["micro"].items():
+        print(f"  {name:24} {values['calls_per_sec']:12.0f} calls/s")
+    for name, values in results["macro"].items():
+        latencies = "  ".join(f"{metric} {value:8.1f}" for metric, value in values.items())
+        print(f"  {name:24} {latencies}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="2048 engine and bot benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and save the results")
+    run_parser.add_argument("--output", default=DEFAULT_BASELINE)
+    run_parser.add_argument("--positions", type=int, default=POSITION_COUNT)
+    run_parser.add_argument("--micro-only", action="store_true")
+
+    compare_parser = commands.add_parser("compare", help="compare results against a baseline")
+    compare_parser.add_argument("baseline", nargs="?", default=DEFAULT_BASELINE)
+    compare_parser.add_argument("current", nargs="?", help="saved results; runs the benchmarks when omitted")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_benchmarks(args.positions, args.micro_only)
+        print_results(results)
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"saved to {args.output}")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if args.current is not None:
+        with open(args.current) as file:
+            current = json.load(file)
+    else:
+        current = run_benchmarks(baseline["meta"]["positions"], micro_only=not baseline["macro"])
+        print_results(current)
+
+    regressions = find_regressions(baseline, current, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print(f"no regressions over {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
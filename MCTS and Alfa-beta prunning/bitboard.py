@@ -0,0 +1,189 @@
+import numpy as np
+
+from game_functions import _spawn_draws, _opening_cells
+
+
+# board packed into one 64-bit int: every cell is a 4-bit exponent
+# (0 = empty, 1 = 2, 2 = 4, ...), cell (r, c) lives at bits 4 * (4 * r + c),
+# so row r is (board >> 16 * r) & 0xFFFF with column 0 in the lowest nibble
+
+CELL_COUNT = 4
+NUMBER_OF_SQUARES = CELL_COUNT * CELL_COUNT
+ROW_MASK = 0xFFFF
+MAX_EXPONENT = 15
+WIN_EXPONENT = 11
+NEW_TILE_DISTRIBUTION = (1, 1, 1, 1, 1, 1, 1, 1, 1, 2)
+
+
+def _reverse_row(row):
+    return ((row & 0xF) << 12) | ((row & 0xF0) << 4) | ((row >> 4) & 0xF0) | (row >> 12)
+
+
+def _build_row_tables():
+    row_left = [0] * (ROW_MASK + 1)
+    row_right = [0] * (ROW_MASK + 1)
+    row_score = [0] * (ROW_MASK + 1)
+
+    for row in range(ROW_MASK + 1):
+        tiles = [(row >> (4 * i)) & 0xF for i in range(CELL_COUNT)]
+        line = [t for t in tiles if t != 0]
+        merged = []
+        score = 0
+        i = 0
+        while i < len(line):
+            if i + 1 < len(line) and line[i] == line[i + 1] and line[i] < MAX_EXPONENT:
+                merged.append(line[i] + 1)
+                score += 1 << (line[i] + 1)
+                i += 2
+            else:
+                merged.append(line[i])
+                i += 1
+
+        result = 0
+        for i, t in enumerate(merged):
+            result |= t << (4 * i)
+
+        row_left[row] = result
+        row_score[row] = score
+
+    for row in range(ROW_MASK + 1):
+        row_right[row] = _reverse_row(row_left[_reverse_row(row)])
+
+    return row_left, row_right, row_score
+
+
+# moved row and merge score for every one of the 65536 possible rows
+ROW_LEFT, ROW_RIGHT, ROW_SCORE = _build_row_tables()
+ROW_SCORE_RIGHT = [ROW_SCORE[_reverse_row(row)] for row in range(ROW_MASK + 1)]
+
+
+def transpose(board):
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def _move_rows(board, row_table, score_table):
+    r0 = board & ROW_MASK
+    r1 = (board >> 16) & ROW_MASK
+    r2 = (board >> 32) & ROW_MASK
+    r3 = board >> 48
+    new_board = (row_table[r0]
+                 | (row_table[r1] << 16)
+                 | (row_table[r2] << 32)
+                 | (row_table[r3] << 48))
+    score = score_table[r0] + score_table[r1] + score_table[r2] + score_table[r3]
+    return new_board, score
+
+
+def move_left(board):
+    new_board, score = _move_rows(board, ROW_LEFT, ROW_SCORE)
+    return new_board, new_board != board, score
+
+
+def move_right(board):
+    new_board, score = _move_rows(board, ROW_RIGHT, ROW_SCORE_RIGHT)
+    return new_board, new_board != board, score
+
+
+def move_up(board):
+    new_board, score = _move_rows(transpose(board), ROW_LEFT, ROW_SCORE)
+    new_board = transpose(new_board)
+    return new_board, new_board != board, score
+
+
+def move_down(board):
+    new_board, score = _move_rows(transpose(board), ROW_RIGHT, ROW_SCORE_RIGHT)
+    new_board = transpose(new_board)
+    return new_board, new_board != board, score
+
+
+def fixed_move(board):
+    move_order = [move_left, move_up, move_down, move_right]
+    for func in move_order:
+        new_board, move_made, _ = func(board)
+        if move_made:
+            return new_board, True
+    return board, False
+
+
+def random_move(board, rng=None):
+    # same move order and draws as game_functions.random_move
+    results = [move(board) for move in (move_up, move_down, move_left, move_right)]
+    legal_moves = [result for result in results if result[1]]
+    if len(legal_moves) == 0:
+        return board, False, 0
+    if rng is None:
+        return legal_moves[np.random.randint(0, len(legal_moves))]
+    return legal_moves[int(rng.random() * len(legal_moves))]
+
+
+def empty_cells(board):
+    return [i for i in range(NUMBER_OF_SQUARES) if not (board >> (4 * i)) & 0xF]
+
+
+def get_empty_cells_count(board):
+    count = 0
+    for i in range(NUMBER_OF_SQUARES):
+        if not (board >> (4 * i)) & 0xF:
+            count += 1
+    return count
+
+
+def add_new_tile(board, rng=None):
+    """
+    Jak game_functions.add_new_tile: te same losowania z rng (albo
+    z globalnego np.random), więc to samo ziarno daje ten sam kafelek.
+    """
+    value_draw, cell_draw = _spawn_draws(rng)
+    cells = empty_cells(board)
+    if not cells:
+        return board
+    cell = cells[int(cell_draw * len(cells))]
+    exponent = NEW_TILE_DISTRIBUTION[int(value_draw * len(NEW_TILE_DISTRIBUTION))]
+    return board | (exponent << (4 * cell))
+
+
+def initialize_game(rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    first, second = _opening_cells(rng)
+    return (1 << (4 * first)) | (1 << (4 * second))
+
+
+def max_exponent(board):
+    best = 0
+    while board:
+        best = max(best, board & 0xF)
+        board >>= 4
+    return best
+
+
+def check_for_win(board):
+    # like game_functions.check_for_win: a 2048 tile is on the board
+    return any((board >> (4 * i)) & 0xF == WIN_EXPONENT for i in range(NUMBER_OF_SQUARES))
+
+
+def to_bitboard(board):
+    """
+    Zamienia planszę numpy 4x4 z wartościami kafelków na bitboard.
+    """
+    result = 0
+    for i, value in enumerate(np.asarray(board).ravel().tolist()):
+        if value:
+            result |= (int(value).bit_length() - 1) << (4 * i)
+    return result
+
+
+def to_array(board):
+    """
+    Zamienia bitboard z powrotem na planszę numpy 4x4 z wartościami kafelków.
+    """
+    exponents = [(board >> (4 * i)) & 0xF for i in range(NUMBER_OF_SQUARES)]
+    values = [1 << e if e else 0 for e in exponents]
+    return np.array(values, dtype="int").reshape((CELL_COUNT, CELL_COUNT))
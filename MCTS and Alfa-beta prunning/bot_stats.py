@@ -1,12 +1,25 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import time
-from game_functions import initialize_game, add_new_tile
+import os
+import random
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from game_functions import initialize_game, add_new_tile, RandomStream
+from search_stats import summarize_moves
 
 import MCTS2048
 import Expectimax2048 
 
 GAMES_PER_CONFIG = 5  
+# games run as (configuration, game index) jobs on this many processes
+WORKERS = os.cpu_count() or 1
+# every job seeds its own Generator from (BASE_SEED, config, game), so the
+# results do not depend on WORKERS or on the order jobs finish in
+BASE_SEED = 2048
+# turn on the bots' INSTRUMENT_SEARCH and print a search summary per game
+COLLECT_SEARCH_STATS = False
 
 CONFIGURATIONS = [
     ("MCTS (fast)", MCTS2048, 10, 5),      
@@ -35,10 +48,23 @@ TILE_COLORS = {
 def get_color(value):
     return TILE_COLORS.get(value, '#3c3a32')
 
-def play_single_game(ai_module, spm, sl):
-    board = initialize_game()
-    board = add_new_tile(board)
-    board = add_new_tile(board)
+def job_rng(config_index, game_index, base_seed=BASE_SEED):
+    return np.random.default_rng(np.random.SeedSequence([base_seed, config_index, game_index]))
+
+def seed_global_state(rng):
+    # the bots still draw from the legacy global generators
+    np.random.seed(int(rng.integers(2**32)))
+    random.seed(int(rng.integers(2**32)))
+
+def play_single_game(ai_module, spm, sl, rng=None, move_stats=None):
+    spawns = None
+    if rng is not None:
+        seed_global_state(rng)
+        # tile spawns of the game itself come from the job's own stream
+        spawns = RandomStream(rng, block_size=1024)
+    board = initialize_game(rng)
+    board = add_new_tile(board, spawns)
+    board = add_new_tile(board, spawns)
     
     score = 0
     game_over = False
@@ -49,35 +75,91 @@ def play_single_game(ai_module, spm, sl):
         except Exception as e:
             print(f"Bot mistake: {e}")
             break
+        if move_stats is not None and getattr(ai_module, "last_search_stats", None) is not None:
+            move_stats.append(ai_module.last_search_stats)
 
         if valid:
             board = new_board
             score += move_score
-            board = add_new_tile(board)
+            board = add_new_tile(board, spawns)
         else:
             game_over = True
             
     return score, np.max(board)
 
+def play_job(config_index, game_index, module_name, spm, sl, base_seed=BASE_SEED, collect_stats=False):
+    """
+    Jedna gra z turnieju, wykonywana w procesie roboczym. Z collect_stats
+    zwraca też summarize_moves z liczników wyszukiwania wszystkich ruchów.
+    """
+    ai_module = importlib.import_module(module_name)
+    rng = job_rng(config_index, game_index, base_seed)
+    move_stats = None
+    if collect_stats:
+        ai_module.INSTRUMENT_SEARCH = True
+        move_stats = []
+    start_time = time.time()
+    final_score, max_tile = play_single_game(ai_module, spm, sl, rng, move_stats)
+    game_time = time.time() - start_time
+    search_stats = summarize_moves(move_stats) if collect_stats else None
+    return config_index, game_index, final_score, max_tile, game_time, search_stats
+
+def run_games(configurations, games_per_config, workers=WORKERS, base_seed=BASE_SEED, collect_stats=COLLECT_SEARCH_STATS):
+    """
+    Rozgrywa wszystkie gry turnieju w puli procesów i zwraca wyniki
+    (config_index, game_index, score, max_tile, seconds, search_stats)
+    w miarę kończenia.
+    """
+    jobs = [
+        (config_index, game_index, module.__name__, spm, sl, base_seed, collect_stats)
+        for config_index, (_, module, spm, sl) in enumerate(configurations)
+        for game_index in range(games_per_config)
+    ]
+    if workers <= 1:
+        for job in jobs:
+            yield play_job(*job)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(play_job, *job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
 def run_statistics():
     results = {} 
 
     
     # collecting data
-    for name, module, spm, sl in CONFIGURATIONS:
-        print(f"\nTesting: {name}...")
-        results[name] = {'scores': [], 'max_tiles': []}
-        
-        start_time = time.time()
-        
-        for i in range(GAMES_PER_CONFIG):
-            final_score, max_tile = play_single_game(module, spm, sl)
-            results[name]['scores'].append(final_score)
-            results[name]['max_tiles'].append(max_tile)
-            print(f"  Simulation {i+1}: Max Square = {max_tile}, Score = {int(final_score)}")
-            
-        elapsed = time.time() - start_time
-        print(f"  Time: {elapsed:.2f}s")
+    for name, _, _, _ in CONFIGURATIONS:
+        results[name] = {
+            'scores': [0] * GAMES_PER_CONFIG,
+            'max_tiles': [0] * GAMES_PER_CONFIG,
+            'time': 0.0,
+        }
+
+    print(f"Running {len(CONFIGURATIONS) * GAMES_PER_CONFIG} games on {WORKERS} workers...")
+    start_time = time.time()
+
+    for config_index, i, final_score, max_tile, game_time, search_stats in run_games(CONFIGURATIONS, GAMES_PER_CONFIG):
+        name = CONFIGURATIONS[config_index][0]
+        results[name]['scores'][i] = final_score
+        results[name]['max_tiles'][i] = max_tile
+        results[name]['time'] += game_time
+        print(f"  {name} simulation {i+1}: Max Square = {max_tile}, Score = {int(final_score)}, Time = {game_time:.2f}s")
+        if search_stats is not None:
+            per_move = search_stats['per_move']
+            seconds = search_stats['seconds']
+            print(f"    per move: {per_move['ms']:.1f} ms, {per_move['nodes']:.0f} nodes, "
+                  f"{per_move['leaf_evaluations']:.0f} evaluations, {per_move['rollouts']:.0f} rollouts; "
+                  f"cache hits {search_stats['cache_hits']}; "
+                  f"moves {seconds.get('move_generation', 0):.2f}s, spawns {seconds.get('spawning', 0):.2f}s, "
+                  f"evaluation {seconds.get('evaluation', 0):.2f}s")
+
+    elapsed = time.time() - start_time
+    for name in results:
+        print(f"  {name} time: {results[name]['time']:.2f}s")
+    print(f"  Total time: {elapsed:.2f}s")
 
     bot_names = list(results.keys())
     
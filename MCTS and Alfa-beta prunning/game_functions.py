@@ -6,10 +6,90 @@ CELL_COUNT = 4
 NUMBER_OF_SQUARES = CELL_COUNT * CELL_COUNT
 NEW_TILE_DISTRIBUTION = np.array([2, 2, 2, 2, 2, 2, 2, 2 ,2, 4])
 
-def initialize_game():
+# move indices shared by the bots and the symmetry tables
+MOVE_UP = 0
+MOVE_DOWN = 1
+MOVE_LEFT = 2
+MOVE_RIGHT = 3
+MOVE_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+SYMMETRY_COUNT = 8
+# uniform numbers drawn at once by RandomStream
+RANDOM_BLOCK_SIZE = 4096
+
+def _build_move_lines():
+    # flat cell indices of every line, ordered from the edge the tiles move towards
+    positions = np.arange(NUMBER_OF_SQUARES).reshape((CELL_COUNT, CELL_COUNT))
+    return np.array([
+        positions.T,
+        positions[::-1].T,
+        positions,
+        positions[:, ::-1],
+    ])
+
+
+# MOVE_LINES[move, line, position] -> flat cell index, position 0 is the edge
+MOVE_LINES = _build_move_lines()
+
+class RandomStream:
+    """
+    Liczby losowe z generatora pobierane blokami po block_size. Ma metodę
+    random() jak np.random.Generator, więc można ją podać wszędzie tam,
+    gdzie funkcje przyjmują rng.
+    """
+
+    def __init__(self, rng=None, block_size=RANDOM_BLOCK_SIZE):
+        if not hasattr(rng, "random"):
+            rng = np.random.default_rng(rng)
+        self.rng = rng
+        self.block_size = block_size
+        self._block = np.empty(0)
+        self._values = []
+        self._position = block_size
+
+    def _refill(self):
+        self._block = self.rng.random(self.block_size)
+        self._values = self._block.tolist()
+        self._position = 0
+
+    def random(self, size=None):
+        if size is None:
+            if self._position >= self.block_size:
+                self._refill()
+            value = self._values[self._position]
+            self._position += 1
+            return value
+
+        count = int(np.prod(size))
+        if count > self.block_size:
+            return self.rng.random(size)
+        if self._position + count > len(self._block):
+            self._refill()
+        values = self._block[self._position:self._position + count].reshape(size)
+        self._position += count
+        return values
+
+
+def _spawn_draws(rng):
+    # two uniforms: tile value and cell choice
+    if rng is None:
+        rng = np.random
+    return rng.random(), rng.random()
+
+
+def _opening_cells(rng):
+    # two distinct cells from two uniforms, so a RandomStream works as rng too
+    first = int(rng.random() * NUMBER_OF_SQUARES)
+    second = int(rng.random() * (NUMBER_OF_SQUARES - 1))
+    if second >= first:
+        second += 1
+    return first, second
+
+
+def initialize_game(rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
     board = np.zeros((NUMBER_OF_SQUARES), dtype="int")
-    initial_twos = np.random.default_rng().choice(NUMBER_OF_SQUARES, 2, replace=False)
-    board[initial_twos] = 2
+    board[list(_opening_cells(rng))] = 2
     board = board.reshape((CELL_COUNT, CELL_COUNT))
     return board
 
@@ -79,34 +159,300 @@ def move_right(board):
 
 
 def fixed_move(board):
-    move_order = [move_left, move_up, move_down, move_right]
-    for func in move_order:
-        new_board, move_made, _ = func(board)
-        if move_made:
-            return new_board, True
+    new_boards, _, legal = generate_moves(board)
+    for move in (MOVE_LEFT, MOVE_UP, MOVE_DOWN, MOVE_RIGHT):
+        if legal[move]:
+            return new_boards[move], True
     return board, False
 
 
-def random_move(board):
-    move_made = False
-    move_order = [move_right, move_up, move_down, move_left]
-    while not move_made and len(move_order) > 0:
-        move_index = np.random.randint(0, len(move_order))
-        move = move_order[move_index]
-        board, move_made, score  = move(board)
-        if move_made:
-            return board, True, score
-        move_order.pop(move_index)
-    return board, False, score
-
-
-def add_new_tile(board):
-    tile_value = NEW_TILE_DISTRIBUTION[np.random.randint(0, len(NEW_TILE_DISTRIBUTION))]
-    tile_row_options, tile_col_options = np.nonzero(np.logical_not(board))
-    tile_loc = np.random.randint(0, len(tile_row_options))
-    board[tile_row_options[tile_loc], tile_col_options[tile_loc]] = tile_value
+def random_move(board, rng=None):
+    new_boards, scores, legal = generate_moves(board)
+    legal_moves = np.flatnonzero(legal)
+    if len(legal_moves) == 0:
+        return board, False, 0
+    if rng is None:
+        move = legal_moves[np.random.randint(0, len(legal_moves))]
+    else:
+        move = legal_moves[int(rng.random() * len(legal_moves))]
+    return new_boards[move], True, scores[move]
+
+
+def add_new_tile(board, rng=None):
+    """
+    Dokłada kafelek w losowym wolnym polu. rng to np.random.Generator albo
+    RandomStream; bez niego losowanie idzie przez globalny np.random.
+    """
+    value_draw, cell_draw = _spawn_draws(rng)
+    empty_count = 0
+    for index in range(NUMBER_OF_SQUARES):
+        if board.item(index) == 0:
+            empty_count += 1
+    tile_value = NEW_TILE_DISTRIBUTION.item(int(value_draw * len(NEW_TILE_DISTRIBUTION)))
+    tile_loc = int(cell_draw * empty_count)
+    for index in range(NUMBER_OF_SQUARES):
+        if board.item(index) == 0:
+            if tile_loc == 0:
+                board[index // CELL_COUNT, index % CELL_COUNT] = tile_value
+                return board
+            tile_loc -= 1
     return board
 
 
 def check_for_win(board):
     return 2048 in board
+
+
+
+def apply_symmetry(board, transform):
+    """
+    Jedna z 8 symetrii kwadratu: transpozycja dla transform >= 4,
+    potem obrót o 90 stopni transform % 4 razy.
+    """
+    if transform >= 4:
+        board = board.T
+    return np.rot90(board, transform % 4)
+
+
+def _build_symmetry_move_table():
+    # follow two neighbouring cells through each transform to see where
+    # every move direction ends up
+    positions = np.arange(NUMBER_OF_SQUARES).reshape((CELL_COUNT, CELL_COUNT))
+    forward = np.zeros((SYMMETRY_COUNT, POSSIBLE_MOVES_COUNT), dtype="int")
+    for transform in range(SYMMETRY_COUNT):
+        transformed = apply_symmetry(positions, transform)
+        locations = {int(v): divmod(i, CELL_COUNT) for i, v in enumerate(transformed.ravel())}
+        for move, (dr, dc) in enumerate(MOVE_DIRECTIONS):
+            start = locations[positions[1, 1]]
+            end = locations[positions[1 + dr, 1 + dc]]
+            forward[transform, move] = MOVE_DIRECTIONS.index((end[0] - start[0], end[1] - start[1]))
+    backward = np.argsort(forward, axis=1)
+    return forward, backward
+
+
+# SYMMETRY_MOVES[t][m]: move m on the original board seen on the transformed one
+# INVERSE_SYMMETRY_MOVES[t][m]: move m on the transformed board played on the original
+SYMMETRY_MOVES, INVERSE_SYMMETRY_MOVES = _build_symmetry_move_table()
+
+
+def canonicalize(board):
+    """
+    Zwraca kanoniczną postać planszy (najmniejszą leksykograficznie z 8
+    symetrii) oraz numer przekształcenia, które do niej prowadzi.
+    Ruch wybrany na planszy kanonicznej wraca do oryginału przez
+    original_move(move, transform).
+    """
+    best_board = None
+    best_key = None
+    best_transform = 0
+    for transform in range(SYMMETRY_COUNT):
+        candidate = apply_symmetry(board, transform)
+        key = candidate.ravel().tolist()
+        if best_key is None or key < best_key:
+            best_key = key
+            best_board = candidate
+            best_transform = transform
+    return np.ascontiguousarray(best_board), best_transform
+
+
+def canonical_key(board):
+    canonical_board, _ = canonicalize(board)
+    return canonical_board.tobytes()
+
+
+def original_move(move, transform):
+    return int(INVERSE_SYMMETRY_MOVES[transform][move])
+
+
+
+def _slide_lines(lines):
+    """
+    Przesuwa i scala wiersze (M, 4) w stronę indeksu 0, wektorowo.
+    """
+    order = np.argsort(lines == 0, axis=1, kind="stable")
+    lines = np.take_along_axis(lines, order, axis=1)
+    scores = np.zeros(len(lines), dtype="int")
+    for col in range(CELL_COUNT - 1):
+        merge = (lines[:, col] == lines[:, col + 1]) & (lines[:, col] != 0)
+        lines[merge, col] *= 2
+        lines[merge, col + 1] = 0
+        scores += np.where(merge, lines[:, col], 0)
+    order = np.argsort(lines == 0, axis=1, kind="stable")
+    return np.take_along_axis(lines, order, axis=1), scores
+
+
+def generate_moves(board):
+    """
+    Wszystkie cztery ruchy naraz, bez obracania planszy. Zwraca plansze
+    po ruchach (4, 4, 4), punkty (4,) i maskę dozwolonych ruchów (4,),
+    w kolejności MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT.
+    """
+    new_boards = np.empty((POSSIBLE_MOVES_COUNT, CELL_COUNT, CELL_COUNT), dtype="int")
+    scores = [0] * POSSIBLE_MOVES_COUNT
+    legal = [False] * POSSIBLE_MOVES_COUNT
+    generate_moves_into(board, new_boards.reshape((POSSIBLE_MOVES_COUNT, NUMBER_OF_SQUARES)), scores, legal)
+    return new_boards, np.array(scores), np.array(legal)
+
+
+def move_batch(boards, moves):
+    """
+    Wykonuje ruch moves[i] na planszy boards[i] dla całego stosu (N, 4, 4).
+    Zwraca nowe plansze, maskę wykonanych ruchów i punkty.
+    """
+    count = len(boards)
+    flat = boards.reshape((count, NUMBER_OF_SQUARES))
+    rows = np.arange(count)[:, None, None]
+    indices = MOVE_LINES[moves]
+    lines, scores = _slide_lines(flat[rows, indices].reshape((count * CELL_COUNT, CELL_COUNT)))
+    new_flat = np.empty_like(flat)
+    new_flat[rows, indices] = lines.reshape((count, CELL_COUNT, CELL_COUNT))
+    moved = np.any(new_flat != flat, axis=1)
+    scores = scores.reshape((count, CELL_COUNT)).sum(axis=1)
+    return new_flat.reshape(boards.shape), moved, scores
+
+
+def legal_moves_batch(boards):
+    """
+    Maska (N, 4) ruchów możliwych na każdej planszy, w kolejności MOVE_UP..MOVE_RIGHT.
+    """
+    lines = boards.reshape((len(boards), NUMBER_OF_SQUARES))[:, MOVE_LINES]
+    head = lines[..., :-1]
+    tail = lines[..., 1:]
+    can_push = (head == 0) & (tail != 0)
+    can_merge = (head == tail) & (tail != 0)
+    return np.any(can_push | can_merge, axis=(2, 3))
+
+
+def random_moves_batch(legal, rng=None):
+    """
+    Losuje dla każdej planszy jeden z dozwolonych ruchów.
+    """
+    if rng is None:
+        rng = np.random
+    keys = np.where(legal, rng.random(legal.shape), -1.0)
+    return np.argmax(keys, axis=1)
+
+
+def add_new_tile_batch(boards, rng=None, mask=None):
+    """
+    Dokłada losowy kafelek na każdej planszy stosu, która ma wolne pole
+    (i, jeśli podano mask, jest w niej zaznaczona). Z RandomStream jako rng
+    liczby losowe dla wszystkich plansz pochodzą z jednego bloku.
+    """
+    if rng is None:
+        rng = np.random
+    count = len(boards)
+    flat = boards.reshape((count, NUMBER_OF_SQUARES))
+    empty = flat == 0
+    keys = np.where(empty, rng.random(empty.shape), -1.0)
+    cells = np.argmax(keys, axis=1)
+    values = NEW_TILE_DISTRIBUTION[(rng.random(count) * len(NEW_TILE_DISTRIBUTION)).astype("int")]
+    has_empty = empty.any(axis=1)
+    if mask is not None:
+        has_empty &= mask
+    flat[has_empty, cells[has_empty]] = values[has_empty]
+    return boards
+
+
+# MOVE_LINES as nested tuples, so the in-place kernels index without numpy
+MOVE_LINE_TUPLES = tuple(tuple(tuple(int(i) for i in line) for line in lines) for lines in MOVE_LINES)
+
+
+class ScratchArena:
+    """
+    Wstępnie zaalokowane bufory na następniki dla każdej głębokości
+    przeszukiwania. Widoki na bufory są tworzone raz, więc kolejne węzły
+    niczego nie alokują.
+    """
+
+    def __init__(self, max_depth):
+        self.max_depth = 0
+        self.successors = []
+        self.flats = []
+        self.scores = []
+        self.legal = []
+        self.ensure(max_depth)
+
+    def ensure(self, max_depth):
+        while self.max_depth <= max_depth:
+            boards = np.zeros((POSSIBLE_MOVES_COUNT, CELL_COUNT, CELL_COUNT), dtype="int")
+            self.successors.append([boards[move] for move in range(POSSIBLE_MOVES_COUNT)])
+            self.flats.append([boards[move].reshape(NUMBER_OF_SQUARES) for move in range(POSSIBLE_MOVES_COUNT)])
+            self.scores.append([0] * POSSIBLE_MOVES_COUNT)
+            self.legal.append([False] * POSSIBLE_MOVES_COUNT)
+            self.max_depth += 1
+
+
+def generate_moves_into(board, out_flats, out_scores, out_legal):
+    """
+    generate_moves zapisujące wynik do buforów podanych przez wywołującego:
+    out_flats to cztery płaskie widoki (16,) na plansze po ruchach,
+    out_scores i out_legal to listy długości 4. Zwraca liczbę dozwolonych ruchów.
+    """
+    cells = board.ravel().tolist()
+    legal_count = 0
+    for move in range(POSSIBLE_MOVES_COUNT):
+        out = out_flats[move]
+        score = 0
+        moved = False
+        for line in MOVE_LINE_TUPLES[move]:
+            position = 0
+            pending = 0
+            for index in line:
+                value = cells[index]
+                if value == 0:
+                    continue
+                if pending == value:
+                    target = line[position]
+                    out[target] = value * 2
+                    score += value * 2
+                    moved = True
+                    position += 1
+                    pending = 0
+                else:
+                    if pending:
+                        target = line[position]
+                        out[target] = pending
+                        if cells[target] != pending:
+                            moved = True
+                        position += 1
+                    pending = value
+            if pending:
+                target = line[position]
+                out[target] = pending
+                if cells[target] != pending:
+                    moved = True
+                position += 1
+            while position < CELL_COUNT:
+                target = line[position]
+                out[target] = 0
+                if cells[target]:
+                    moved = True
+                position += 1
+        out_scores[move] = score
+        out_legal[move] = moved
+        if moved:
+            legal_count += 1
+    return legal_count
+
+
+def add_new_tile_inplace(flat, rng=None):
+    """
+    add_new_tile na płaskim widoku (16,) bez tworzenia tymczasowych tablic.
+    """
+    empty_count = 0
+    for index in range(NUMBER_OF_SQUARES):
+        if flat.item(index) == 0:
+            empty_count += 1
+    if empty_count == 0:
+        return False
+    value_draw, cell_draw = _spawn_draws(rng)
+    tile_value = NEW_TILE_DISTRIBUTION.item(int(value_draw * len(NEW_TILE_DISTRIBUTION)))
+    tile_loc = int(cell_draw * empty_count)
+    for index in range(NUMBER_OF_SQUARES):
+        if flat.item(index) == 0:
+            if tile_loc == 0:
+                flat[index] = tile_value
+                return True
+            tile_loc -= 1
+    return False
@@ -0,0 +1,105 @@
+import numpy as np
+
+DEFAULT_CAPACITY = 1 << 18
+# first_child values of nodes without a child range
+UNEXPANDED = -1
+TERMINAL = -2
+# move_scores value of a chance node for an illegal move
+ILLEGAL_MOVE = -1
+
+
+def _child_ranges(starts, counts):
+    # concatenation of range(start, start + count) for every pair
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(int(counts.sum()))
+
+
+class NodePool:
+    """
+    Drzewo MCTS jako struktura tablic o stałej pojemności. Węzeł to indeks;
+    dzieci węzła zajmują ciągły przedział first_child..first_child +
+    child_count, a plansza jest zapisana jako bitboard w keys. Węzły gracza
+    mają po 4 dzieci (po jednym na ruch), węzły losowe po jednym dziecku na
+    każde możliwe dołożenie kafelka.
+
+    Gdy pula jest pełna, allocate zwraca -1 i drzewo przestaje rosnąć.
+    compact zostawia tylko poddrzewo nowego korzenia, ułożone wszerz od
+    indeksu 0, a resztę węzłów oddaje do ponownego użycia.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.keys = np.zeros(capacity, dtype=np.uint64)
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.value_sums = np.zeros(capacity, dtype=np.float64)
+        self.move_scores = np.zeros(capacity, dtype=np.int32)
+        self.first_child = np.full(capacity, UNEXPANDED, dtype=np.int32)
+        self.child_count = np.zeros(capacity, dtype=np.int16)
+        self.size = 0
+
+    def _arrays(self):
+        return (self.keys, self.visits, self.value_sums, self.move_scores, self.first_child, self.child_count)
+
+    def clear(self):
+        self.size = 0
+
+    def free(self):
+        return self.capacity - self.size
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self._arrays())
+
+    def allocate(self, count):
+        """
+        Rezerwuje count kolejnych węzłów i zwraca indeks pierwszego albo -1.
+        """
+        if self.size + count > self.capacity:
+            return -1
+        start = self.size
+        end = start + count
+        self.visits[start:end] = 0
+        self.value_sums[start:end] = 0
+        self.move_scores[start:end] = 0
+        self.first_child[start:end] = UNEXPANDED
+        self.child_count[start:end] = 0
+        self.size = end
+        return start
+
+    def new_root(self, key):
+        self.clear()
+        root = self.allocate(1)
+        self.keys[root] = key
+        return root
+
+    def find_child(self, node, key):
+        first = self.first_child[node]
+        if first < 0:
+            return -1
+        matches = np.flatnonzero(self.keys[first:first + self.child_count[node]] == np.uint64(key))
+        return first + int(matches[0]) if len(matches) else -1
+
+    def compact(self, root):
+        """
+        Przenosi poddrzewo root na początek puli (root dostaje indeks 0)
+        i zwalnia wszystkie pozostałe węzły.
+        """
+        levels = []
+        new_firsts = []
+        level = np.array([root])
+        next_free = 1
+        while len(level):
+            firsts = self.first_child[level]
+            counts = self.child_count[level].astype(np.int64)
+            counts[firsts < 0] = 0
+            starts = next_free + np.cumsum(counts) - counts
+            levels.append(level)
+            new_firsts.append(np.where(firsts < 0, firsts, starts))
+            next_free += int(counts.sum())
+            level = _child_ranges(firsts[counts > 0].astype(np.int64), counts[counts > 0])
+
+        order = np.concatenate(levels)
+        for array in self._arrays():
+            array[:len(order)] = array[order]
+        self.first_child[:len(order)] = np.concatenate(new_firsts)
+        self.size = len(order)
+        return 0
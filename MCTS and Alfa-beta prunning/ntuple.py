@@ -0,0 +1,180 @@
+import sys
+import hashlib
+
+import numpy as np
+
+from game_functions import initialize_game, add_new_tile, generate_moves, apply_symmetry
+from game_functions import CELL_COUNT, NUMBER_OF_SQUARES, SYMMETRY_COUNT
+
+# flat cell indices of the base tuples; every tuple is also read through all
+# 8 symmetries of the board, which share its table
+DEFAULT_TUPLES = (
+    (0, 1, 2, 3),
+    (4, 5, 6, 7),
+    (0, 1, 4, 5),
+    (1, 2, 5, 6),
+    (5, 6, 9, 10),
+)
+# tile exponents 0 (empty) .. 15 (32768); larger tiles share the last state
+TILE_STATES = 16
+LEARNING_RATE = 0.1
+DEFAULT_WEIGHTS_PATH = "ntuple_weights.npy"
+
+
+def board_exponents(boards):
+    """
+    Wykładniki kafelków (0 dla pustego pola) dla planszy albo stosu plansz.
+    """
+    exponents = np.frexp(np.asarray(boards))[1] - 1
+    return np.clip(exponents, 0, TILE_STATES - 1)
+
+
+def _symmetric_cells(tuples):
+    positions = np.arange(NUMBER_OF_SQUARES).reshape((CELL_COUNT, CELL_COUNT))
+    cells = []
+    for base in tuples:
+        for transform in range(SYMMETRY_COUNT):
+            cells.append(apply_symmetry(positions, transform).ravel()[list(base)])
+    return np.array(cells)
+
+
+class NTupleNetwork:
+    """
+    Sieć n-krotek: dla każdej krotki pól tablica wag indeksowana
+    wykładnikami kafelków na tych polach. Wartość planszy to suma wag ze
+    wszystkich krotek we wszystkich 8 symetriach; uczona metodą TD(0) na
+    stanach po ruchu, szacuje punkty, które gra jeszcze zdobędzie.
+
+    Wagi to jedna tablica float32 (krotki, TILE_STATES ** długość), zapisywana
+    przez np.save; load(..., mmap=True) otwiera ją przez np.memmap, a taka
+    sieć jest przekazywana do innych procesów jako ścieżka, nie kopia wag.
+
+    Jako ocena liści: Expectimax2048.EVALUATOR = network.evaluate,
+    Expectimax2048.BATCH_EVALUATOR = network.evaluate_batch,
+    MCTS2048.ROLLOUT_EVALUATOR = network.evaluate. Przy równoległym
+    przeszukiwaniu EVALUATOR i ROLLOUT_EVALUATOR idą do procesów roboczych
+    razem z zadaniami (Expectimax2048.search_settings, MCTS2048._rollout_jobs),
+    więc sieć otwarta przez load(..., mmap=True) trafia tam jako ścieżka.
+    """
+
+    def __init__(self, tuples=DEFAULT_TUPLES, weights=None, path=None):
+        lengths = {len(cells) for cells in tuples}
+        if len(lengths) != 1:
+            raise ValueError("All tuples must have the same length")
+        self.tuples = tuple(tuple(cells) for cells in tuples)
+        length = lengths.pop()
+        shape = (len(self.tuples), TILE_STATES ** length)
+        if weights is None:
+            weights = np.zeros(shape, dtype=np.float32)
+        elif weights.shape != shape or weights.dtype != np.float32:
+            raise ValueError(f"Expected float32 weights of shape {shape}, got {weights.dtype} {weights.shape}")
+        self.weights = weights
+        self.path = path
+        self._flat = weights.reshape(-1)
+        self._cells = _symmetric_cells(self.tuples)
+        self._radix = TILE_STATES ** np.arange(length)
+        self._offsets = np.repeat(np.arange(len(self.tuples)) * shape[1], SYMMETRY_COUNT)
+
+    @classmethod
+    def load(cls, path, tuples=DEFAULT_TUPLES, mmap=True, writable=False):
+        mode = ("r+" if writable else "r") if mmap else None
+        return cls(tuples, np.load(path, mmap_mode=mode), path if mmap else None)
+
+    def save(self, path):
+        np.save(path, self.weights)
+
+    def fingerprint(self):
+        """
+        Skrót krotek i wag, np. dla Expectimax2048.search_fingerprint.
+        """
+        digest = hashlib.sha256(repr(self.tuples).encode())
+        digest.update(np.ascontiguousarray(self.weights).data)
+        return digest.hexdigest()
+
+    def __getstate__(self):
+        if self.path is not None:
+            return {"tuples": self.tuples, "path": self.path}
+        return {"tuples": self.tuples, "weights": np.asarray(self.weights)}
+
+    def __setstate__(self, state):
+        if "path" in state:
+            loaded = NTupleNetwork.load(state["path"], state["tuples"])
+        else:
+            loaded = NTupleNetwork(state["tuples"], state["weights"])
+        self.__dict__.update(loaded.__dict__)
+
+    def indices(self, board):
+        exponents = board_exponents(board).reshape(NUMBER_OF_SQUARES)
+        return exponents[self._cells] @ self._radix + self._offsets
+
+    def evaluate(self, board):
+        return float(self._flat[self.indices(board)].sum(dtype=np.float64))
+
+    def evaluate_batch(self, boards):
+        exponents = board_exponents(boards).reshape((len(boards), NUMBER_OF_SQUARES))
+        indices = exponents[:, self._cells] @ self._radix + self._offsets
+        return self._flat[indices].sum(axis=1, dtype=np.float64)
+
+    def update(self, board, delta, learning_rate=LEARNING_RATE):
+        """
+        Przesuwa wartość planszy o learning_rate * delta, rozkładając
+        zmianę równo na wszystkie odczytane wagi.
+        """
+        indices = self.indices(board)
+        np.add.at(self._flat, indices, np.float32(learning_rate * delta / len(indices)))
+
+    def best_move(self, board):
+        """
+        Ruch maksymalizujący punkty za ruch + wartość planszy po ruchu.
+        Zwraca (plansza po ruchu, punkty) albo (None, 0), gdy ruchu nie ma.
+        """
+        new_boards, move_scores, legal = generate_moves(board)
+        if not legal.any():
+            return None, 0
+        values = np.where(legal, move_scores + self.evaluate_batch(new_boards), -np.inf)
+        move = int(np.argmax(values))
+        return new_boards[move], int(move_scores[move])
+
+
+def ai_move(board, network):
+    new_board, points = network.best_move(board)
+    if new_board is None:
+        return board, False, 0
+    return new_board, True, points
+
+
+def train(network, games, learning_rate=LEARNING_RATE, rng=None, report_every=100):
+    """
+    Uczy sieć TD(0) na stanach po ruchu, grając ze sobą zachłannie
+    względem własnej oceny. Zwraca wyniki kolejnych gier.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    scores = []
+    for game in range(games):
+        board = initialize_game(rng)
+        afterstate = None
+        score = 0
+        while True:
+            new_board, points = network.best_move(board)
+            if afterstate is not None:
+                target = 0.0 if new_board is None else points + network.evaluate(new_board)
+                network.update(afterstate, target - network.evaluate(afterstate), learning_rate)
+            if new_board is None:
+                break
+            score += points
+            afterstate = new_board
+            board = add_new_tile(np.copy(new_board), rng)
+        scores.append(score)
+        if report_every and (game + 1) % report_every == 0:
+            print(f"games {game + 2 - report_every}-{game + 1}: mean score {np.mean(scores[-report_every:]):.0f}")
+    return scores
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_WEIGHTS_PATH
+    network = NTupleNetwork()
+    train(network, games, rng=np.random.default_rng(0))
+    network.save(path)
+    print(f"saved {network.weights.nbytes} bytes of weights to {path}")
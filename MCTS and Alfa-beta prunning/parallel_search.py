@@ -0,0 +1,69 @@
+import os
+import random
+import atexit
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+WORKER_COUNT = os.cpu_count() or 1
+# jobs are grouped into this many chunks per worker to keep IPC low
+CHUNKS_PER_WORKER = 2
+
+_pool = None
+
+
+def _seed_worker():
+    # forked or spawned workers must not share one random stream
+    np.random.seed()
+    random.seed()
+
+
+def get_pool():
+    """
+    Zwraca długo żyjącą pulę procesów, tworząc ją przy pierwszym użyciu.
+    """
+    global _pool
+    if _pool is None:
+        context = multiprocessing.get_context("spawn")
+        _pool = ProcessPoolExecutor(max_workers=WORKER_COUNT, mp_context=context, initializer=_seed_worker)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def split_chunks(items, chunk_count):
+    chunk_count = max(1, min(chunk_count, len(items)))
+    size, extra = divmod(len(items), chunk_count)
+    chunks = []
+    start = 0
+    for i in range(chunk_count):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def map_chunked(func, items):
+    """
+    Wywołuje func(chunk) na kawałkach listy items w puli procesów
+    i skleja wyniki w tej samej kolejności. func musi zwracać listę
+    i być zdefiniowana na poziomie modułu.
+    """
+    if not items:
+        return []
+    chunks = split_chunks(items, WORKER_COUNT * CHUNKS_PER_WORKER)
+    futures = [get_pool().submit(func, chunk) for chunk in chunks]
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+
+from bitboard import MAX_EXPONENT, to_bitboard
+from game_functions import canonicalize
+
+DEFAULT_SLOTS = 1 << 22
+# consecutive slots searched for a key (and for a slot to overwrite)
+BUCKET_SIZE = 4
+MAX_STORED_TILE = 1 << MAX_EXPONENT
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+KEY_MASK = 0xFFFFFFFFFFFFFFFF
+
+# key 0 (the empty board) marks a free slot
+ENTRY_DTYPE = np.dtype([("key", "<u8"), ("depth", "<i2"), ("value", "<f8")])
+# the file starts with MAGIC and the fingerprint of the search settings its
+# values were computed with, zero-padded to HEADER_SIZE bytes
+MAGIC = b"2048PST1"
+HEADER_SIZE = 64
+MAX_FINGERPRINT_SIZE = HEADER_SIZE - len(MAGIC)
+
+
+class PositionStore:
+    """
+    Tablica mieszająca na dysku, otwierana przez np.memmap: (plansza,
+    głębokość) -> wartość. Plik ma stały rozmiar; gdy kubełek jest pełny,
+    nowy wpis zastępuje najpłytszy z nich, z policy="depth" tylko wtedy,
+    gdy nie jest on głębszy od nowego. Wiele procesów może otworzyć ten sam
+    plik tylko do odczytu bez dodatkowej pamięci; pisać powinien jeden proces.
+
+    Z canonical=True kluczem jest postać kanoniczna planszy, co ma sens
+    tylko dla oceny symetrycznej względem obrotów i odbić.
+
+    Nagłówek pliku zapisuje fingerprint (bajty) ustawień, z którymi liczono
+    wartości; podany przy otwieraniu musi się z nim zgadzać.
+    """
+
+    def __init__(self, path, writable=False, policy="depth", canonical=False, fingerprint=None):
+        if policy not in ("depth", "always"):
+            raise ValueError(f"Unknown overwrite policy: {policy}")
+        self.path = path
+        self.writable = writable
+        self.policy = policy
+        self.canonical = canonical
+        self.fingerprint = _read_fingerprint(path)
+        if fingerprint is not None and _padded(fingerprint) != self.fingerprint:
+            raise ValueError(f"{path} was filled with different search settings")
+        self.entries = np.memmap(path, dtype=ENTRY_DTYPE, mode="r+" if writable else "r", offset=HEADER_SIZE)
+        self.slots = len(self.entries)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def create(cls, path, slots=DEFAULT_SLOTS, policy="depth", canonical=False, fingerprint=b""):
+        with open(path, "wb") as file:
+            file.write(MAGIC + _padded(fingerprint))
+            file.truncate(HEADER_SIZE + slots * ENTRY_DTYPE.itemsize)
+        return cls(path, writable=True, policy=policy, canonical=canonical)
+
+    @classmethod
+    def open(cls, path, writable=False, slots=DEFAULT_SLOTS, policy="depth", canonical=False, fingerprint=None):
+        """
+        Otwiera istniejący plik albo, przy writable=True, tworzy nowy.
+        Plik z innym fingerprint niż podany nie zostanie otwarty (ValueError).
+        """
+        if writable and not os.path.exists(path):
+            return cls.create(path, slots, policy, canonical, fingerprint or b"")
+        return cls(path, writable, policy, canonical, fingerprint)
+
+    def _key(self, board):
+        if board.max() > MAX_STORED_TILE:
+            return None
+        if self.canonical:
+            board, _ = canonicalize(board)
+        return to_bitboard(board)
+
+    def _bucket(self, key, depth):
+        mixed = ((key ^ (depth * 0x100000001)) * HASH_MULTIPLIER) & KEY_MASK
+        return (mixed >> 16) % self.slots
+
+    def get(self, board, depth):
+        key = self._key(board)
+        if key is None:
+            return None
+        start = self._bucket(key, depth)
+        for offset in range(BUCKET_SIZE):
+            entry = self.entries[(start + offset) % self.slots]
+            if entry["key"] == key and entry["depth"] == depth:
+                self.hits += 1
+                return float(entry["value"])
+        self.misses += 1
+        return None
+
+    def put(self, board, depth, value):
+        if not self.writable:
+            raise PermissionError(f"{self.path} is opened read-only")
+        key = self._key(board)
+        if key is None:
+            return
+        start = self._bucket(key, depth)
+        target = None
+        for offset in range(BUCKET_SIZE):
+            slot = (start + offset) % self.slots
+            entry = self.entries[slot]
+            if entry["key"] == 0 or (entry["key"] == key and entry["depth"] == depth):
+                target = slot
+                break
+            if target is None or entry["depth"] < self.entries[target]["depth"]:
+                target = slot
+
+        if self.policy == "depth" and self.entries[target]["key"] not in (0, key):
+            if self.entries[target]["depth"] > depth:
+                return
+        self.entries[target] = (key, depth, value)
+
+    def flush(self):
+        if self.writable:
+            self.entries.flush()
+
+    def used_slots(self):
+        return int(np.count_nonzero(self.entries["key"]))
+
+
+def _padded(fingerprint):
+    if len(fingerprint) > MAX_FINGERPRINT_SIZE:
+        raise ValueError(f"Fingerprint longer than {MAX_FINGERPRINT_SIZE} bytes")
+    return fingerprint.ljust(MAX_FINGERPRINT_SIZE, b"\0")
+
+
+def _read_fingerprint(path):
+    with open(path, "rb") as file:
+        header = file.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+        raise ValueError(f"{path} is not a position store")
+    return header[len(MAGIC):]
@@ -0,0 +1,55 @@
+import numpy as np
+
+from bitboard import CELL_COUNT, ROW_MASK, transpose, to_bitboard
+
+# bit 0 of every nibble; a board has an empty cell iff some nibble is zero
+NIBBLE_LOW_BITS = 0x1111111111111111
+
+
+def _row_exponents():
+    rows = np.arange(ROW_MASK + 1)
+    return np.stack([(rows >> (4 * c)) & 0xF for c in range(CELL_COUNT)], axis=1)
+
+
+def build_score_tables(weight_matrix, monotonicity_weight=10, empty_bonus=500000):
+    """
+    Rozkłada heurystykę z Expectimax2048.calculate_score na wyrazy wierszy
+    i kolumn: row_tables[r][wiersz] to ważona suma wiersza r, jego
+    monotoniczność w poziomie i premia za puste pola, column_table[kolumna]
+    to monotoniczność w pionie.
+    """
+    exponents = _row_exponents()
+    values = np.where(exponents > 0, 1 << exponents, 0).astype("int64")
+    empty_counts = np.sum(exponents == 0, axis=1)
+    monotonicity = -np.sum(np.abs(values[:, :-1] - values[:, 1:]), axis=1) * monotonicity_weight
+
+    row_tables = []
+    for r in range(CELL_COUNT):
+        weighted = values @ np.asarray(weight_matrix[r], dtype="int64")
+        row_tables.append((weighted + monotonicity + empty_counts * empty_bonus).tolist())
+
+    return row_tables, monotonicity.tolist()
+
+
+def table_score(board, tables):
+    """
+    Ocena bitboardu przez 8 odczytów z tablic (4 wiersze, 4 kolumny).
+    """
+    empty_probe = board | (board >> 1) | (board >> 2) | (board >> 3)
+    if empty_probe & NIBBLE_LOW_BITS == NIBBLE_LOW_BITS:
+        return -1e9
+
+    row_tables, column_table = tables
+    columns = transpose(board)
+    return (row_tables[0][board & ROW_MASK]
+            + row_tables[1][(board >> 16) & ROW_MASK]
+            + row_tables[2][(board >> 32) & ROW_MASK]
+            + row_tables[3][board >> 48]
+            + column_table[columns & ROW_MASK]
+            + column_table[(columns >> 16) & ROW_MASK]
+            + column_table[(columns >> 32) & ROW_MASK]
+            + column_table[columns >> 48])
+
+
+def table_score_array(board, tables):
+    return table_score(to_bitboard(board), tables)
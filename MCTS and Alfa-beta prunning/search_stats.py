@@ -0,0 +1,124 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+PHASES = ("move_generation", "spawning", "evaluation")
+
+
+class SearchStats:
+    """
+    Liczniki jednego wywołania ai_move: rozwinięte węzły według rodzaju
+    i głębokości (w expectimax pozostałej, w drzewie UCT liczonej od
+    korzenia), oceny liści, symulacje i ich ruchy, trafienia
+    w pamięć pozycji oraz czas w generowaniu ruchów, dokładaniu kafelków
+    i ocenie.
+
+    Czas i liczbę wywołań mierzą opakowania podstawiane na czas ruchu pod
+    nazwy funkcji w module bota (installed), więc wyłączone liczniki nic
+    nie kosztują. Liczone jest tylko to, co dzieje się w bieżącym procesie.
+    """
+
+    def __init__(self):
+        self.nodes = defaultdict(int)
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.rollouts = 0
+        self.rollout_plies = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def count_node(self, kind, depth):
+        self.nodes[(kind, depth)] += 1
+
+    def count_rollouts(self, rollouts, plies):
+        self.rollouts += rollouts
+        self.rollout_plies += plies
+
+    def timed(self, phase, func, batch=False):
+        """
+        func mierzona jako phase; z batch=True jedno wywołanie liczy się
+        jako len(pierwszego argumentu) wywołań.
+        """
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            self.seconds[phase] += time.perf_counter() - start
+            self.calls[phase] += len(args[0]) if batch else 1
+            return result
+        return wrapper
+
+    @contextmanager
+    def installed(self, namespace, functions):
+        """
+        Podmienia namespace[nazwa] na mierzone wersje dla functions:
+        {nazwa: (faza, batch)}; None pod nazwą jest pomijane.
+        """
+        originals = {name: namespace[name] for name in functions if namespace[name] is not None}
+        for name, func in originals.items():
+            phase, batch = functions[name]
+            namespace[name] = self.timed(phase, func, batch)
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds["total"] += time.perf_counter() - start
+            namespace.update(originals)
+
+    def summary(self):
+        nodes = defaultdict(dict)
+        for (kind, depth), count in sorted(self.nodes.items()):
+            nodes[kind][depth] = count
+        return {
+            "nodes": dict(nodes),
+            "leaf_evaluations": self.calls["evaluation"],
+            "rollouts": self.rollouts,
+            "rollout_plies": self.rollout_plies,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "seconds": {phase: self.seconds[phase] for phase in PHASES + ("total",)},
+        }
+
+
+@contextmanager
+def instrumented(namespace, functions, skip=None):
+    """
+    Liczniki jednego ai_move modułu bota: namespace (globals() modułu)
+    dostaje na ten czas _stats = nowe SearchStats z mierzonymi functions,
+    a na koniec last_search_stats = summary() i _stats = None. skip to
+    nazwa funkcji, której nie podmieniać - ocena wysyłana do procesów
+    roboczych musi dać się zserializować.
+    """
+    timed = {name: spec for name, spec in functions.items() if name != skip}
+    stats = SearchStats()
+    namespace["_stats"] = stats
+    try:
+        with stats.installed(namespace, timed):
+            yield stats
+    finally:
+        namespace["last_search_stats"] = stats.summary()
+        namespace["_stats"] = None
+
+
+def summarize_moves(summaries):
+    """
+    Sumy i średnie na ruch z listy SearchStats.summary() kolejnych ruchów.
+    """
+    totals = {
+        "moves": len(summaries),
+        "nodes": sum(sum(by_depth.values()) for summary in summaries for by_depth in summary["nodes"].values()),
+        "seconds": defaultdict(float),
+    }
+    for key in ("leaf_evaluations", "rollouts", "rollout_plies", "cache_hits", "cache_misses"):
+        totals[key] = sum(summary[key] for summary in summaries)
+    for summary in summaries:
+        for phase, seconds in summary["seconds"].items():
+            totals["seconds"][phase] += seconds
+    totals["seconds"] = dict(totals["seconds"])
+    moves = max(1, len(summaries))
+    totals["per_move"] = {
+        "nodes": totals["nodes"] / moves,
+        "leaf_evaluations": totals["leaf_evaluations"] / moves,
+        "rollouts": totals["rollouts"] / moves,
+        "ms": 1000 * totals["seconds"].get("total", 0.0) / moves,
+    }
+    return totals
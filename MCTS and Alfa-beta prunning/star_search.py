@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+
+import Expectimax2048 as expectimax_bot
+
+
+def _timed_moves(boards, depth, pruning):
+    """
+    Ruchy Expectimax2048.ai_move przy MAX_DEPTH = depth, łączna liczba
+    rozwiniętych węzłów i czas.
+    """
+    saved = (expectimax_bot.MAX_DEPTH, expectimax_bot.STAR1_PRUNING, expectimax_bot.INSTRUMENT_SEARCH)
+    expectimax_bot.MAX_DEPTH = depth
+    expectimax_bot.STAR1_PRUNING = pruning
+    expectimax_bot.INSTRUMENT_SEARCH = True
+    moves = []
+    nodes = 0
+    start = time.perf_counter()
+    try:
+        for board in boards:
+            moves.append(expectimax_bot.ai_move(np.copy(board), 0, 0, parallel=False)[0])
+            nodes += sum(sum(by_depth.values()) for by_depth in expectimax_bot.last_search_stats["nodes"].values())
+    finally:
+        expectimax_bot.MAX_DEPTH, expectimax_bot.STAR1_PRUNING, expectimax_bot.INSTRUMENT_SEARCH = saved
+    return moves, nodes, time.perf_counter() - start
+
+
+def compare_pruning(boards, depths=(3, 4, 5)):
+    """
+    Porównuje Expectimax2048.ai_move z cięciami Star1 (STAR1_PRUNING) i bez
+    nich: liczbę rozwiniętych węzłów, czas i to, czy wybrany ruch jest ten sam.
+    """
+    for depth in depths:
+        full_moves, full_nodes, full_seconds = _timed_moves(boards, depth, False)
+        pruned_moves, pruned_nodes, pruned_seconds = _timed_moves(boards, depth, True)
+        for board, full_move, pruned_move in zip(boards, full_moves, pruned_moves):
+            if not np.array_equal(full_move, pruned_move):
+                raise AssertionError(f"Pruning changed the best move at depth {depth}:\n{board}")
+        reduction = 1 - pruned_nodes / full_nodes if full_nodes else 0.0
+        print(f"depth {depth}: {full_nodes} -> {pruned_nodes} nodes ({reduction:.1%} fewer), "
+              f"{full_seconds:.2f}s -> {pruned_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    from game_functions import initialize_game, add_new_tile, random_move
+
+    rng = np.random.default_rng(0)
+    np.random.seed(0)
+    positions = []
+    for _ in range(10):
+        board = initialize_game(rng)
+        for _ in range(int(rng.integers(5, 120))):
+            board, valid, _ = random_move(board)
+            if not valid:
+                break
+            board = add_new_tile(board)
+        positions.append(board)
+    compare_pruning(positions)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import bitboard
+import game_functions
+
+MOVES = ("move_up", "move_down", "move_left", "move_right")
+
+
+def _random_boards(count, seed=0):
+    # tiles up to 2 ** 14, so every merge still fits a 4-bit exponent
+    rng = np.random.default_rng(seed)
+    exponents = rng.integers(0, 15, (count, 4, 4))
+    exponents[rng.random((count, 4, 4)) < 0.4] = 0
+    return np.where(exponents > 0, 2 ** exponents, 0)
+
+
+def test_round_trip():
+    for board in _random_boards(500):
+        assert np.array_equal(bitboard.to_array(bitboard.to_bitboard(board)), board)
+
+
+@pytest.mark.parametrize("name", MOVES)
+def test_moves_match_game_functions(name):
+    for board in _random_boards(1000, seed=1):
+        expected_board, expected_moved, expected_score = getattr(game_functions, name)(board)
+        new_board, moved, score = getattr(bitboard, name)(bitboard.to_bitboard(board))
+        assert bitboard.to_array(new_board).tolist() == expected_board.tolist()
+        assert moved == expected_moved
+        assert score == expected_score
+
+
+def test_helpers_match_game_functions():
+    for board in _random_boards(500, seed=2):
+        packed = bitboard.to_bitboard(board)
+        assert bitboard.get_empty_cells_count(packed) == np.count_nonzero(board == 0)
+        assert bitboard.check_for_win(packed) == game_functions.check_for_win(board)
+
+
+def test_seeded_games_match_game_functions():
+    for seed in range(20):
+        board_rng = np.random.default_rng(seed)
+        packed_rng = np.random.default_rng(seed)
+        board = game_functions.initialize_game(board_rng)
+        packed = bitboard.initialize_game(packed_rng)
+        while True:
+            board = game_functions.add_new_tile(board, board_rng)
+            packed = bitboard.add_new_tile(packed, packed_rng)
+            assert bitboard.to_bitboard(board) == packed
+            board, moved, _ = game_functions.random_move(board, board_rng)
+            packed, packed_moved, _ = bitboard.random_move(packed, packed_rng)
+            assert moved == packed_moved
+            if not moved:
+                break
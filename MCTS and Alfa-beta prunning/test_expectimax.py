@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+import Expectimax2048
+
+
+def test_score_tables_match_reference():
+    Expectimax2048.check_score_tables(samples=2000)
+
+
+def test_score_tables_follow_rebuilt_weights():
+    saved = Expectimax2048.MONOTONICITY_WEIGHT
+    try:
+        Expectimax2048.MONOTONICITY_WEIGHT = 3
+        Expectimax2048.rebuild_score_tables()
+        Expectimax2048.check_score_tables(samples=500, seed=1)
+    finally:
+        Expectimax2048.MONOTONICITY_WEIGHT = saved
+        Expectimax2048.rebuild_score_tables()
+    assert Expectimax2048.table_calculate_score(np.full((4, 4), 2)) == Expectimax2048.calculate_score(np.full((4, 4), 2))
+
+
+def _positions(count, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = []
+    while len(positions) < count:
+        board = np.where(rng.random((4, 4)) < 0.5, 0, 2 ** rng.integers(1, 8, (4, 4)))
+        if Expectimax2048.root_moves(board):
+            positions.append(board)
+    return positions
+
+
+def _root_scores(board, depth, parallel):
+    root_boards = [new_board for new_board, _ in Expectimax2048.root_moves(board)]
+    table = Expectimax2048.transposition_table
+    table.clear()
+    return Expectimax2048._search_root_scores(root_boards, depth, table, parallel)
+
+
+def test_parallel_root_scores_use_parent_settings(monkeypatch):
+    from ntuple import NTupleNetwork
+
+    weights = np.random.default_rng(0).random((5, 16 ** 4), dtype=np.float32)
+    monkeypatch.setattr(Expectimax2048, "EVALUATOR", NTupleNetwork(weights=weights).evaluate)
+    monkeypatch.setattr(Expectimax2048, "PROBABILITY_CUTOFF", 1e-2)
+    monkeypatch.setattr(Expectimax2048, "MAX_FOUR_SPAWNS", 0)
+    for board in _positions(3):
+        serial = _root_scores(board, 3, parallel=False)
+        assert _root_scores(board, 3, parallel=True) == pytest.approx(serial, rel=1e-9)
+
+
+def test_parallel_root_scores_use_parent_weights(monkeypatch):
+    monkeypatch.setattr(Expectimax2048, "SCORE_TABLES", Expectimax2048.SCORE_TABLES)
+    monkeypatch.setattr(Expectimax2048, "MONOTONICITY_WEIGHT", 3)
+    monkeypatch.setattr(Expectimax2048, "WEIGHT_MATRIX", Expectimax2048.WEIGHT_MATRIX.T.copy())
+    Expectimax2048.rebuild_score_tables()
+    for board in _positions(3, seed=1):
+        serial = _root_scores(board, 3, parallel=False)
+        assert _root_scores(board, 3, parallel=True) == pytest.approx(serial, rel=1e-9)
+
+
+
+def test_table_entries_follow_probability_and_four_spawns():
+    table = Expectimax2048.transposition_table
+    for board in _positions(3, seed=2):
+        for new_board, _ in Expectimax2048.root_moves(board):
+            expected = Expectimax2048.expectimax(np.copy(new_board), 3, False, None)
+            table.clear()
+            # entries searched along an unlikely path, or with the 4-tile
+            # spawns used up, must not stand in for the root's value
+            Expectimax2048.expectimax(np.copy(new_board), 3, False, table, Expectimax2048.PROBABILITY_CUTOFF * 2)
+            Expectimax2048.expectimax(np.copy(new_board), 3, False, table, 1.0, Expectimax2048.MAX_FOUR_SPAWNS)
+            assert Expectimax2048.expectimax(np.copy(new_board), 3, False, table) == expected
+
+
+@pytest.mark.parametrize("use_table", [True, False])
+def test_star1_pruning_keeps_the_chosen_move(monkeypatch, use_table):
+    monkeypatch.setattr(Expectimax2048, "USE_TRANSPOSITION_TABLE", use_table)
+    for board in _positions(6, seed=3):
+        monkeypatch.setattr(Expectimax2048, "STAR1_PRUNING", False)
+        full = Expectimax2048.ai_move(np.copy(board), 0, 0, parallel=False)
+        monkeypatch.setattr(Expectimax2048, "STAR1_PRUNING", True)
+        pruned = Expectimax2048.ai_move(np.copy(board), 0, 0, parallel=False)
+        assert np.array_equal(full[0], pruned[0])
+
+
+def test_star1_iterative_deepening_keeps_the_chosen_move(monkeypatch):
+    monkeypatch.setattr(Expectimax2048, "MAX_ITERATIVE_DEPTH", 3)
+    for board in _positions(4, seed=4):
+        monkeypatch.setattr(Expectimax2048, "STAR1_PRUNING", False)
+        full = Expectimax2048.ai_move(np.copy(board), 0, 0, time_budget_ms=60000)
+        monkeypatch.setattr(Expectimax2048, "STAR1_PRUNING", True)
+        pruned = Expectimax2048.ai_move(np.copy(board), 0, 0, time_budget_ms=60000)
+        assert Expectimax2048.last_search_depth == 3
+        assert np.array_equal(full[0], pruned[0])
+
+
+def test_position_store_refuses_other_settings(monkeypatch, tmp_path):
+    path = str(tmp_path / "positions.bin")
+    monkeypatch.setattr(Expectimax2048, "position_store", None)
+    Expectimax2048.open_position_store(path, writable=True)
+    Expectimax2048.close_position_store()
+
+    monkeypatch.setattr(Expectimax2048, "PROBABILITY_CUTOFF", 1e-3)
+    with pytest.raises(ValueError):
+        Expectimax2048.open_position_store(path)
+    monkeypatch.undo()
+    monkeypatch.setattr(Expectimax2048, "position_store", None)
+    assert Expectimax2048.open_position_store(path).used_slots() == 0
@@ -0,0 +1,81 @@
+import numpy as np
+
+import game_functions
+from game_functions import move_up, move_down, move_left, move_right
+
+# reference moves in MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT order
+REFERENCE_MOVES = (move_up, move_down, move_left, move_right)
+
+
+def _random_boards(count, seed=0):
+    rng = np.random.default_rng(seed)
+    exponents = rng.integers(0, 12, (count, 4, 4))
+    exponents[rng.random((count, 4, 4)) < 0.4] = 0
+    return np.where(exponents > 0, 2 ** exponents, 0)
+
+
+def _reference(board):
+    results = [move(board) for move in REFERENCE_MOVES]
+    return (
+        np.array([new_board for new_board, _, _ in results]),
+        np.array([score for _, _, score in results]),
+        np.array([moved for _, moved, _ in results]),
+    )
+
+
+def test_generate_moves_matches_reference_moves():
+    for board in _random_boards(1000):
+        new_boards, scores, legal = game_functions.generate_moves(board)
+        expected_boards, expected_scores, expected_legal = _reference(board)
+        assert np.array_equal(legal, expected_legal)
+        assert np.array_equal(scores, expected_scores)
+        assert np.array_equal(new_boards[legal], expected_boards[legal])
+
+
+def test_generate_moves_into_matches_reference_moves():
+    arena = game_functions.ScratchArena(0)
+    for board in _random_boards(1000, seed=1):
+        legal_count = game_functions.generate_moves_into(board, arena.flats[0], arena.scores[0], arena.legal[0])
+        expected_boards, expected_scores, expected_legal = _reference(board)
+        legal = np.array(arena.legal[0], dtype=bool)
+        assert legal_count == expected_legal.sum()
+        assert np.array_equal(legal, expected_legal)
+        assert np.array_equal(np.array(arena.scores[0])[legal], expected_scores[legal])
+        assert np.array_equal(np.array(arena.successors[0])[legal], expected_boards[legal])
+
+
+def test_batch_moves_match_reference_moves():
+    boards = _random_boards(1000, seed=2)
+    expected = [_reference(board) for board in boards]
+    expected_legal = np.array([legal for _, _, legal in expected])
+    assert np.array_equal(game_functions.legal_moves_batch(boards), expected_legal)
+
+    for move in range(game_functions.POSSIBLE_MOVES_COUNT):
+        moves = np.full(len(boards), move)
+        new_boards, moved, scores = game_functions.move_batch(boards.copy(), moves)
+        assert np.array_equal(moved, expected_legal[:, move])
+        assert np.array_equal(scores, [scores_ref[move] for _, scores_ref, _ in expected])
+        assert np.array_equal(new_boards, [boards_ref[move] for boards_ref, _, _ in expected])
+
+
+def _assert_moves_map_through(board, transformed, transform):
+    new_boards, scores, legal = game_functions.generate_moves(transformed)
+    for move in range(game_functions.POSSIBLE_MOVES_COUNT):
+        original = game_functions.original_move(move, transform)
+        expected_board, expected_moved, expected_score = REFERENCE_MOVES[original](board)
+        assert legal[move] == expected_moved
+        assert scores[move] == expected_score
+        assert np.array_equal(new_boards[move], game_functions.apply_symmetry(expected_board, transform))
+
+
+def test_canonical_moves_map_back_to_original_moves():
+    for board in _random_boards(300, seed=3):
+        canonical, transform = game_functions.canonicalize(board)
+        assert np.array_equal(game_functions.apply_symmetry(board, transform), canonical)
+        _assert_moves_map_through(board, canonical, transform)
+
+
+def test_every_symmetry_maps_moves():
+    for board in _random_boards(50, seed=4):
+        for transform in range(game_functions.SYMMETRY_COUNT):
+            _assert_moves_map_through(board, game_functions.apply_symmetry(board, transform), transform)
@@ -0,0 +1,34 @@
+import numpy as np
+
+import MCTS2048
+from game_functions import generate_moves
+
+
+def _lost_board():
+    return np.array([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]])
+
+
+def test_illegal_first_move_is_never_chosen(monkeypatch):
+    monkeypatch.setattr(MCTS2048, "ROLLOUT_EVALUATOR", lambda board: -1e9)
+    board = np.array([[2, 4, 8, 16], [4, 8, 16, 32], [8, 16, 32, 64], [0, 0, 0, 0]])
+    legal = generate_moves(board)[2]
+    assert legal.any() and not legal.all()
+    for batched in (False, True):
+        np.random.seed(0)
+        new_board, valid, _ = MCTS2048.ai_move(board, 5, 10, batched=batched, parallel=False, uct=False)
+        assert valid
+        assert not np.array_equal(new_board, board)
+
+
+def test_terminal_node_scored_like_a_rollout(monkeypatch):
+    monkeypatch.setattr(MCTS2048, "ROLLOUT_EVALUATOR", lambda board: -5.0)
+    monkeypatch.setattr(MCTS2048, "ROLLOUT_BOOTSTRAP_WEIGHT", 2.0)
+    monkeypatch.setattr(MCTS2048, "_node_pool", None)
+    board = _lost_board()
+    rollout_value = MCTS2048._leaf_value(board, 10)
+
+    MCTS2048._search_root(board)
+    pool = MCTS2048._node_pool
+    MCTS2048._uct_iteration(pool, 0, 10)
+    assert pool.first_child[0] == MCTS2048.TERMINAL
+    assert pool.value_sums[0] == rollout_value == -10.0
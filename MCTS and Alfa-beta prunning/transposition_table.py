@@ -0,0 +1,88 @@
+from collections import OrderedDict
+
+
+DEFAULT_MAX_ENTRIES = 200000
+# how many of the oldest entries are inspected by the depth-preferred policy
+DEPTH_EVICTION_WINDOW = 8
+
+
+class TranspositionTable:
+    """
+    Pamięć wyników wyszukiwania z ograniczonym rozmiarem.
+
+    Klucz to (plansza, głębokość, typ węzła). Po przekroczeniu max_entries
+    usuwany jest najdawniej używany wpis (policy="lru") albo najpłytszy
+    z kilku najstarszych wpisów (policy="depth").
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, policy="lru"):
+        if policy not in ("lru", "depth"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.max_entries = max_entries
+        self.policy = policy
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, accept=None):
+        """
+        Wartość spod key albo None. accept(wartość) może odrzucić
+        znaleziony wpis; odrzucenie liczy się jako chybienie.
+        """
+        entry = self.entries.get(key)
+        if entry is None or (accept is not None and not accept(entry[1])):
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == "lru":
+            self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, depth, value):
+        if key in self.entries:
+            self.entries[key] = (depth, value)
+            self.entries.move_to_end(key)
+            return
+        if len(self.entries) >= self.max_entries:
+            self._evict()
+        self.entries[key] = (depth, value)
+
+    def _evict(self):
+        if self.policy == "lru":
+            self.entries.popitem(last=False)
+        else:
+            shallowest_key = None
+            shallowest_depth = None
+            for i, (key, (depth, _)) in enumerate(self.entries.items()):
+                if i >= DEPTH_EVICTION_WINDOW:
+                    break
+                if shallowest_depth is None or depth < shallowest_depth:
+                    shallowest_key = key
+                    shallowest_depth = depth
+            del self.entries[shallowest_key]
+        self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate(),
+        }
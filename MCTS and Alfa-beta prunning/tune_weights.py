@@ -0,0 +1,133 @@
+import sys
+
+import numpy as np
+
+import Expectimax2048
+from bot_stats import BASE_SEED, job_rng, play_single_game
+from parallel_search import WORKER_COUNT, map_chunked
+
+# rank of every cell in the snake order of the default WEIGHT_MATRIX;
+# candidate matrices are base ** rank with a per-cell jitter
+SNAKE_RANKS = np.argsort(np.argsort(Expectimax2048.WEIGHT_MATRIX.ravel())).reshape(Expectimax2048.WEIGHT_MATRIX.shape)
+WEIGHT_BASE_RANGE = (2.0, 6.0)
+WEIGHT_JITTER = 0.3
+MONOTONICITY_RANGE = (1.0, 100.0)
+EMPTY_BONUS_RANGE = (1e4, 1e7)
+SURVIVAL_THRESHOLD_RANGE = (0, 4)
+# tuning games search shallower than ai_move's default to play more of them;
+# the survival threshold still adds one ply, as it does at MAX_DEPTH
+TUNING_DEPTH = 2
+
+
+def default_parameters():
+    return {
+        "weight_matrix": Expectimax2048.WEIGHT_MATRIX.tolist(),
+        "monotonicity_weight": Expectimax2048.MONOTONICITY_WEIGHT,
+        "empty_bonus": Expectimax2048.EMPTY_CELL_BONUS,
+        "survival_threshold": Expectimax2048.SURVIVAL_THRESHOLD,
+    }
+
+
+def _log_uniform(rng, low, high):
+    return float(np.exp(rng.uniform(np.log(low), np.log(high))))
+
+
+def random_parameters(rng):
+    base = _log_uniform(rng, *WEIGHT_BASE_RANGE)
+    jitter = np.exp(rng.normal(0.0, WEIGHT_JITTER, SNAKE_RANKS.shape))
+    matrix = np.maximum(np.round(base ** SNAKE_RANKS * jitter), 1).astype("int64")
+    return {
+        "weight_matrix": matrix.tolist(),
+        "monotonicity_weight": int(round(_log_uniform(rng, *MONOTONICITY_RANGE))),
+        "empty_bonus": int(round(_log_uniform(rng, *EMPTY_BONUS_RANGE))),
+        "survival_threshold": int(rng.integers(SURVIVAL_THRESHOLD_RANGE[0], SURVIVAL_THRESHOLD_RANGE[1] + 1)),
+    }
+
+
+def apply_parameters(parameters, depth=None):
+    """
+    Ustawia parametry oceny w Expectimax2048 (w bieżącym procesie).
+    """
+    Expectimax2048.WEIGHT_MATRIX = np.array(parameters["weight_matrix"], dtype="int64")
+    Expectimax2048.MONOTONICITY_WEIGHT = parameters["monotonicity_weight"]
+    Expectimax2048.EMPTY_CELL_BONUS = parameters["empty_bonus"]
+    Expectimax2048.SURVIVAL_THRESHOLD = parameters["survival_threshold"]
+    if depth is not None:
+        Expectimax2048.MAX_DEPTH = depth
+    Expectimax2048.rebuild_score_tables()
+
+
+def _play_jobs(jobs):
+    """
+    Zadanie dla procesu roboczego: wyniki gier (parametry, numer gry, ziarno, głębokość).
+    Pula procesów jest wspólna z parallel_search, więc na koniec przywraca
+    parametry, które proces miał wcześniej.
+    """
+    saved = default_parameters()
+    saved_depth = Expectimax2048.MAX_DEPTH
+    scores = []
+    try:
+        for parameters, game_index, base_seed, depth in jobs:
+            apply_parameters(parameters, depth)
+            score, _ = play_single_game(Expectimax2048, 0, 0, job_rng(0, game_index, base_seed))
+            scores.append(int(score))
+    finally:
+        apply_parameters(saved, saved_depth)
+    return scores
+
+
+def successive_halving(candidates, initial_games=4, eta=2, base_seed=BASE_SEED, depth=TUNING_DEPTH):
+    """
+    Losowe przeszukiwanie z odrzucaniem: w każdej rundzie pozostali
+    kandydaci grają kolejne gry, po czym zostaje najlepsza 1/eta z nich,
+    a liczba gier rośnie eta razy. Gra numer i ma te same losowania
+    kafelków dla wszystkich kandydatów, więc różnice wyników biorą się
+    z parametrów, nie ze szczęścia.
+
+    Zwraca listę (średni wynik, liczba gier, parametry) od najlepszych.
+    """
+    scores = [[] for _ in candidates]
+    survivors = list(range(len(candidates)))
+    games = initial_games
+    eliminated = []
+
+    while True:
+        played = len(scores[survivors[0]])
+        jobs = [(candidates[index], game_index, base_seed, depth)
+                for index in survivors for game_index in range(played, games)]
+        owners = [index for index in survivors for _ in range(played, games)]
+        for index, score in zip(owners, map_chunked(_play_jobs, jobs)):
+            scores[index].append(score)
+
+        survivors.sort(key=lambda index: np.mean(scores[index]), reverse=True)
+        best = survivors[0]
+        print(f"{len(survivors)} candidates x {games} games: best mean {np.mean(scores[best]):.0f} (candidate {best})")
+        if len(survivors) == 1:
+            break
+        keep = max(1, len(survivors) // eta)
+        eliminated = survivors[keep:] + eliminated
+        survivors = survivors[:keep]
+        games *= eta
+
+    ranking = survivors + eliminated
+    return [(float(np.mean(scores[index])), len(scores[index]), candidates[index]) for index in ranking]
+
+
+def tune(candidate_count=32, initial_games=4, eta=2, seed=0, base_seed=BASE_SEED, depth=TUNING_DEPTH):
+    """
+    Kandydat 0 to obecne parametry, reszta jest losowana.
+    """
+    rng = np.random.default_rng(seed)
+    candidates = [default_parameters()] + [random_parameters(rng) for _ in range(candidate_count - 1)]
+    return successive_halving(candidates, initial_games, eta, base_seed, depth)
+
+
+if __name__ == "__main__":
+    candidate_count = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    initial_games = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"Tuning {candidate_count} candidates on {WORKER_COUNT} workers...")
+    ranking = tune(candidate_count, initial_games)
+    mean_score, games, parameters = ranking[0]
+    print(f"best: mean score {mean_score:.0f} over {games} games")
+    for name, value in parameters.items():
+        print(f"  {name} = {value}")
@@ -0,0 +1,76 @@
+import numpy as np
+
+from game_functions import CELL_COUNT, RandomStream
+from game_functions import move_batch, legal_moves_batch, random_moves_batch, add_new_tile_batch
+
+
+class VecEnv2048:
+    """
+    Bezokienkowe środowisko trzymające K niezależnych gier jako jedną
+    tablicę (K, 4, 4). step() wykonuje ruchy wszystkich gier naraz,
+    a zakończone gry są od razu zaczynane od nowa.
+    """
+
+    def __init__(self, num_games, seed=None):
+        self.num_games = num_games
+        self.rng = np.random.default_rng(seed)
+        # spawns and random actions draw from pre-drawn blocks
+        self.stream = RandomStream(self.rng, block_size=max(4096, 32 * num_games))
+        self.boards = np.zeros((num_games, CELL_COUNT, CELL_COUNT), dtype="int")
+        self.scores = np.zeros(num_games, dtype="int")
+        self.moves_made = np.zeros(num_games, dtype="int")
+        self.games_finished = 0
+        self.reset()
+
+    def _new_boards(self, count):
+        boards = np.zeros((count, CELL_COUNT, CELL_COUNT), dtype="int")
+        add_new_tile_batch(boards, self.stream)
+        add_new_tile_batch(boards, self.stream)
+        return boards
+
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.num_games, dtype=bool)
+        count = int(mask.sum())
+        if count:
+            self.boards[mask] = self._new_boards(count)
+            self.scores[mask] = 0
+            self.moves_made[mask] = 0
+        return self.boards
+
+    def legal_moves(self):
+        return legal_moves_batch(self.boards)
+
+    def step(self, actions):
+        """
+        Wykonuje actions[i] (MOVE_UP..MOVE_RIGHT) w grze i.
+
+        Zwraca (boards, rewards, legal, done, info): nagrody to punkty za
+        scalenia, legal mówi, czy ruch zmienił planszę (niedozwolony ruch
+        nie dokłada kafelka), done oznacza grę bez dalszych ruchów. Dla
+        zakończonych gier info["final_boards"] i info["final_scores"]
+        trzymają stan sprzed automatycznego resetu.
+        """
+        actions = np.asarray(actions)
+        new_boards, legal, rewards = move_batch(self.boards, actions)
+        rewards = np.where(legal, rewards, 0)
+
+        add_new_tile_batch(new_boards, self.stream, mask=legal)
+        self.boards = new_boards
+        self.scores += rewards
+        self.moves_made += legal
+
+        done = ~legal_moves_batch(self.boards).any(axis=1)
+        info = {
+            "final_boards": self.boards[done].copy(),
+            "final_scores": self.scores[done].copy(),
+            "final_moves": self.moves_made[done].copy(),
+        }
+        if done.any():
+            self.games_finished += int(done.sum())
+            self.reset(done)
+
+        return self.boards, rewards, legal, done, info
+
+    def random_actions(self):
+        return random_moves_batch(self.legal_moves(), self.stream)